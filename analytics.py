@@ -0,0 +1,63 @@
+import asyncio
+import logging
+import threading
+import time
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+
+class UsageAnalytics:
+    """Копит действия пользователей в памяти и пересчитывает сводки в фоне"""
+
+    def __init__(self, db, interval=60.0, keep_raw_days=30):
+        # Отдельный экземпляр Database: своё соединение и свои транзакции,
+        # фоновая задача не пересекается с запросами обработчиков
+        self.db = db
+        self.interval = interval
+        self.keep_raw_days = keep_raw_days
+        # deque: append в event loop и popleft в рабочем потоке не теряют записей
+        self._pending = deque()  # (user_id, action, unix time)
+        self._lock = threading.Lock()
+
+    def track(self, user_id: int, action: str):
+        """Дёшево для горячего пути: запись в БД пакетом при следующем сбросе"""
+        self._pending.append((user_id, action, time.time()))
+
+    def flush(self) -> int:
+        rows = []
+        try:
+            while True:
+                rows.append(self._pending.popleft())
+        except IndexError:
+            pass
+        if rows:
+            # Формат как у CURRENT_TIMESTAMP: UTC, 'ГГГГ-ММ-ДД ЧЧ:ММ:СС'
+            self.db.add_logs([
+                (user_id, action, time.strftime("%Y-%m-%d %H:%M:%S", time.gmtime(ts)))
+                for user_id, action, ts in rows
+            ])
+        return len(rows)
+
+    def run_once(self):
+        """Блокирующий вызов: сброс буфера, досчёт сводок и чистка старых логов"""
+        with self._lock:
+            flushed = self.flush()
+            processed = 0
+            while True:
+                batch = self.db.rollup_logs()
+                processed += batch
+                if not batch:
+                    break
+            pruned = self.db.prune_logs(self.keep_raw_days) if self.keep_raw_days else 0
+        if flushed or processed or pruned:
+            logger.info("Логи: записано %d, учтено в сводках %d, удалено %d", flushed, processed, pruned,
+                        extra={"event": "logs_rollup"})
+
+    async def run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await asyncio.to_thread(self.run_once)
+            except Exception as e:
+                logger.error("Ошибка пересчёта статистики: %s", e)
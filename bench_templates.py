@@ -0,0 +1,145 @@
+"""Сравнение сборки клавиатур в обработчиках и готовых шаблонов из templates.py
+
+Запуск: python bench_templates.py [итераций]
+Показывает время и выделенную память на одно обновление, отдельно — сериализацию
+клавиатуры в JSON, которую aiogram выполняет при каждой отправке.
+"""
+import json
+import sys
+import time
+import tracemalloc
+
+from aiogram.types import ReplyKeyboardMarkup, KeyboardButton, InlineKeyboardMarkup, InlineKeyboardButton
+from aiogram.utils.keyboard import InlineKeyboardBuilder
+
+import templates
+
+
+# === Как обработчики строили ответы раньше ===
+def old_admin_schedule_panel():
+    days = ["Пн", "Вт", "Ср", "Чт", "Пт", "Сб", "Вс"]
+    builder = InlineKeyboardBuilder()
+    for i, day in enumerate(days):
+        builder.button(text=f"{day} 📅", callback_data=f"admin_schedule_day_{i}")
+    builder.button(text="📅 Сегодня", callback_data="admin_schedule_today")
+    builder.button(text="📅 Завтра", callback_data="admin_schedule_tomorrow")
+    builder.button(text="📅 На неделю", callback_data="admin_schedule_week")
+    builder.adjust(4, 3, 3)
+    return "⚙️ <b>Админ-панель: Расписание</b>\n\nВыберите действие:", builder.as_markup()
+
+
+def old_week_status(statuses):
+    days = ["Пн", "Вт", "Ср", "Чт", "Пт", "Сб"]
+    status_text = "🗓️ <b>Статус расписания на неделю:</b>\n\n"
+    for day_num in range(6):
+        status_text += f"{days[day_num]}: {'✅' if statuses[day_num] else '❌'}\n"
+    status_text += "\nНажмите на день для управления"
+    builder = InlineKeyboardBuilder()
+    for i, day in enumerate(days):
+        builder.button(text=f"{day}", callback_data=f"admin_schedule_day_{i}")
+    builder.button(text="📤 Загрузить всю неделю", callback_data="upload_whole_week")
+    builder.button(text="↩️ Назад", callback_data="back_to_admin_schedule")
+    builder.adjust(6, 1, 1)
+    return status_text, builder.as_markup()
+
+
+def old_back_to_admin():
+    return InlineKeyboardMarkup(inline_keyboard=[
+        [InlineKeyboardButton(text=f"{day} 📅", callback_data=f"admin_schedule_day_{i}")
+         for i, day in enumerate(["Пн", "Вт", "Ср", "Чт"])],
+        [InlineKeyboardButton(text=f"{day} 📅", callback_data=f"admin_schedule_day_{i}")
+         for i, day in enumerate(["Пт", "Сб", "Вс"], 4)],
+        [
+            InlineKeyboardButton(text="📅 Сегодня", callback_data="admin_schedule_today"),
+            InlineKeyboardButton(text="📅 Завтра", callback_data="admin_schedule_tomorrow"),
+            InlineKeyboardButton(text="📅 На неделю", callback_data="admin_schedule_week"),
+        ],
+    ])
+
+
+def old_admin_start(full_name):
+    admin_menu = ReplyKeyboardMarkup(resize_keyboard=True, keyboard=[
+        [KeyboardButton(text='📅 Расписание'), KeyboardButton(text='⚙️ Редакция Расписания')],
+        [KeyboardButton(text='👥 Пользователи'), KeyboardButton(text='📚 ДЗ')],
+    ])
+    text = ("👑 <b>Админ-панель</b>\n\n<b>Доступные команды:</b>\n"
+            '┏━━━━━━━━━━━━━━━━━━━━━━━━━━━┓\n\n'
+            f"• /admin_schedule - управление расписанием\n"
+            f"• /users - список пользователей\n"
+            f"• /broadcast - рассылка\n\n"
+            '┗━━━━━━━━━━━━━━━━━━━━━━━━━━━┛\n'
+            f"Или используйте кнопки ниже.\n\nДоброго времени суток, {full_name}! Вот список быстрых команд:\n\n"
+            '┏━━━━━━━━━━━━━━━━━━━━━━━━━━━┓\n\n'
+            '  ➀: [ /Schedule ] ― Нажми, чтобы увидеть расписание.\n'
+            '  ➁: [ /HomeWork ] ― Нажми, чтобы узнать Д/З.\n'
+            '┗━━━━━━━━━━━━━━━━━━━━━━━━━━━┛')
+    return text, admin_menu
+
+
+# === То же через шаблоны ===
+def new_admin_schedule_panel():
+    return templates.ADMIN_SCHEDULE_TEXT, templates.ADMIN_SCHEDULE_KEYBOARD
+
+
+def new_week_status(statuses):
+    return templates.week_status_text(tuple(statuses)), templates.WEEK_STATUS_KEYBOARD
+
+
+def new_back_to_admin():
+    return templates.ADMIN_SCHEDULE_KEYBOARD
+
+
+def new_admin_start(full_name):
+    return templates.ADMIN_START_TEXT.format(full_name=full_name), templates.ADMIN_MENU
+
+
+STATUSES = [True, True, False, True, True, False]
+
+CASES = [
+    ("admin_schedule_panel", old_admin_schedule_panel, new_admin_schedule_panel, ()),
+    ("week_status", old_week_status, new_week_status, (STATUSES,)),
+    ("back_to_admin", old_back_to_admin, new_back_to_admin, ()),
+    ("admin_start", old_admin_start, new_admin_start, ("Иван Иванов",)),
+]
+
+
+def measure(func, args, iterations):
+    """Время (мкс) и выделенная память (байт) на один вызов"""
+    started = time.perf_counter()
+    for _ in range(iterations):
+        func(*args)
+    elapsed = time.perf_counter() - started
+
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    results = [func(*args) for _ in range(100)]
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    allocated = sum(stat.size_diff for stat in after.compare_to(before, "filename"))
+    del results
+    return elapsed / iterations * 1e6, allocated / 100
+
+
+def serialize(markup):
+    # Так же, как сессия aiogram готовит reply_markup к отправке
+    return json.dumps(markup.model_dump(mode="json", exclude_none=True), ensure_ascii=False)
+
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    print(f"{'ответ':<22}{'до, мкс':>10}{'после, мкс':>12}{'до, Б':>10}{'после, Б':>10}")
+    for name, old, new, args in CASES:
+        old_time, old_mem = measure(old, args, iterations)
+        new_time, new_mem = measure(new, args, iterations)
+        print(f"{name:<22}{old_time:>10.2f}{new_time:>12.2f}{old_mem:>10.0f}{new_mem:>10.0f}")
+
+    print("\nСериализация клавиатуры в JSON (на каждую отправку):")
+    for name, _, new, args in CASES:
+        result = new(*args)
+        markup = result[1] if isinstance(result, tuple) else result
+        ser_time, ser_mem = measure(serialize, (markup,), iterations)
+        print(f"{name:<22}{ser_time:>10.2f} мкс{ser_mem:>10.0f} Б")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,39 @@
+import asyncio
+
+
+class FlightAborted(Exception):
+    """Ведущий вызов отменён; ожидающие получают это вместо CancelledError"""
+
+
+class SingleFlight:
+    """Объединяет одновременные одинаковые запросы в один вызов"""
+
+    def __init__(self):
+        self._inflight = {}  # {key: asyncio.Future}
+
+    async def do(self, key, func, *args, **kwargs):
+        """Выполняет func один раз на ключ, остальные ждут тот же результат.
+
+        Ошибка ведущего вызова достаётся и ожидающим, а его отмена — как
+        FlightAborted: отменять чужие задачи нельзя.
+        """
+        future = self._inflight.get(key)
+        if future is not None:
+            return await asyncio.shield(future)
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            result = await func(*args, **kwargs)
+        except BaseException as e:
+            if isinstance(e, asyncio.CancelledError):
+                e = FlightAborted(key)
+            future.set_exception(e)
+            # Ожидающих может не быть — помечаем исключение как полученное
+            future.exception()
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            del self._inflight[key]
@@ -1,9 +1,15 @@
 import sqlite3
 import logging
 
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Группа по умолчанию: в неё попадают старые данные и пользователи без группы
+DEFAULT_GROUP = "default"
+
+# Таблицы, данные которых разделены по группам
+GROUP_TABLES = ["base_schedule", "actual_schedule", "homework",
+                "schedule_images", "actual_schedule_images", "week_schedule"]
+
 
 class Database:
     def __init__(self, db_file="bot_database.db"):
@@ -114,8 +120,80 @@ class Database:
         )
         """)
 
+        # Календарь: чётность недели и выходные на каждую дату периода
+        self.cursor.execute("""
+        CREATE TABLE IF NOT EXISTS calendar (
+            date TEXT PRIMARY KEY,
+            week_type TEXT,
+            is_override INTEGER DEFAULT 0,
+            is_holiday INTEGER DEFAULT 0
+        )
+        """)
+
+        # file_id фото, уже загруженных в Telegram (путь = хэш содержимого)
+        self.cursor.execute("""
+        CREATE TABLE IF NOT EXISTS media_file_ids (
+            image_path TEXT PRIMARY KEY,
+            file_id TEXT
+        )
+        """)
+
+        # Сводки по логам: действия по часам и действия пользователей по дням (UTC)
+        self.cursor.execute("""
+        CREATE TABLE IF NOT EXISTS logs_hourly (
+            hour TEXT,
+            action TEXT,
+            hits INTEGER,
+            PRIMARY KEY (hour, action)
+        )
+        """)
+
+        self.cursor.execute("""
+        CREATE TABLE IF NOT EXISTS logs_daily_users (
+            day TEXT,
+            user_id INTEGER,
+            action TEXT,
+            hits INTEGER,
+            PRIMARY KEY (day, user_id, action)
+        )
+        """)
+
+        # Служебные значения; data_version растёт при каждом изменении расписаний
+        self.cursor.execute("""
+        CREATE TABLE IF NOT EXISTS meta (
+            key TEXT PRIMARY KEY,
+            value INTEGER
+        )
+        """)
+        self.cursor.execute("INSERT OR IGNORE INTO meta (key, value) VALUES ('data_version', 0)")
+
+        self.migrate_groups()
         self.connection.commit()
 
+    def migrate_groups(self):
+        """Добавляет колонку группы в старые таблицы и индексы по группе"""
+        for table in GROUP_TABLES:
+            columns = [row[1] for row in self.cursor.execute(f"PRAGMA table_info({table})")]
+            if "group_name" not in columns:
+                self.cursor.execute(
+                    f"ALTER TABLE {table} ADD COLUMN group_name TEXT DEFAULT '{DEFAULT_GROUP}'"
+                )
+                logger.info("Таблица %s разделена по группам", table)
+
+        # Индексы начинаются с группы: запросы всегда идут в пределах одной группы
+        self.cursor.execute("CREATE INDEX IF NOT EXISTS idx_base_schedule_group "
+                            "ON base_schedule (group_name, day_of_week)")
+        self.cursor.execute("CREATE INDEX IF NOT EXISTS idx_actual_schedule_group "
+                            "ON actual_schedule (group_name, date)")
+        self.cursor.execute("CREATE INDEX IF NOT EXISTS idx_homework_group "
+                            "ON homework (group_name, date_due)")
+        self.cursor.execute("CREATE INDEX IF NOT EXISTS idx_schedule_images_group "
+                            "ON schedule_images (group_name, day_of_week, week_type)")
+        self.cursor.execute("CREATE INDEX IF NOT EXISTS idx_actual_schedule_images_group "
+                            "ON actual_schedule_images (group_name, date)")
+        self.cursor.execute("CREATE INDEX IF NOT EXISTS idx_week_schedule_group "
+                            "ON week_schedule (group_name, week_type)")
+
     # === МЕТОДЫ ДЛЯ ПОЛЬЗОВАТЕЛЕЙ ===
     def user_exists(self, user_id: int) -> bool:
         result = self.cursor.execute(
@@ -131,7 +209,7 @@ class Database:
                 VALUES (?, ?, ?, ?, 'pending')
             """, (user_id, username, full_name, surname))
             self.connection.commit()
-            logger.info(f"Добавлен пользователь: {user_id}")
+            logger.info("Добавлен пользователь: %s", user_id, extra={"user_id": user_id})
             return True
         except sqlite3.IntegrityError:
             return False
@@ -149,10 +227,10 @@ class Database:
                 (user_id,)
             )
             self.connection.commit()
-            print(f"✅ Пользователь {user_id} одобрен в БД")
+            logger.info("Пользователь %s одобрен в БД", user_id, extra={"user_id": user_id})
             return True
         except Exception as e:
-            print(f"❌ Ошибка при одобрении пользователя {user_id}: {e}")
+            logger.error("Ошибка при одобрении пользователя %s: %s", user_id, e, extra={"user_id": user_id})
             return False
 
     def get_user_status(self, user_id: int) -> str:
@@ -166,101 +244,178 @@ class Database:
         status = self.get_user_status(user_id)
         return status == 'approved'
 
+    def get_user_group(self, user_id: int) -> str:
+        """Получает группу пользователя"""
+        result = self.connection.execute(
+            "SELECT group_name FROM users WHERE user_id = ?",
+            (user_id,)
+        ).fetchone()
+        return result[0] if result and result[0] else DEFAULT_GROUP
+
+    def set_user_group(self, user_id: int, group_name: str) -> bool:
+        """Назначает пользователю группу"""
+        self.cursor.execute(
+            "UPDATE users SET group_name = ? WHERE user_id = ?",
+            (group_name, user_id)
+        )
+        self.connection.commit()
+        return self.cursor.rowcount > 0
+
     # === МЕТОДЫ ДЛЯ РАСПИСАНИЯ ПО ДНЯМ ===
-    def add_schedule_image(self, day_of_week: int, image_path: str, week_type: str = "all"):
+    def add_schedule_image(self, day_of_week: int, image_path: str, week_type: str = "all",
+                           group_name: str = DEFAULT_GROUP):
         """Добавляет фото расписания на день"""
         self.cursor.execute(
-            "DELETE FROM schedule_images WHERE day_of_week = ? AND week_type = ?",
-            (day_of_week, week_type)
+            "DELETE FROM schedule_images WHERE group_name = ? AND day_of_week = ? AND week_type = ?",
+            (group_name, day_of_week, week_type)
         )
 
         self.cursor.execute(
-            "INSERT INTO schedule_images (day_of_week, image_path, week_type) VALUES (?, ?, ?)",
-            (day_of_week, image_path, week_type)
+            "INSERT INTO schedule_images (group_name, day_of_week, image_path, week_type) VALUES (?, ?, ?, ?)",
+            (group_name, day_of_week, image_path, week_type)
         )
 
+        self.bump_data_version()
         self.connection.commit()
 
-    def get_schedule_image(self, day_of_week: int, week_type: str = "all"):
+    def get_schedule_image(self, day_of_week: int, week_type: str = "all", group_name: str = DEFAULT_GROUP):
         """Получает фото расписания на день"""
-        result = self.cursor.execute(
-            "SELECT image_path FROM schedule_images WHERE day_of_week = ? AND week_type = ?",
-            (day_of_week, week_type)
-        ).fetchone()
-
-        if result:
-            return result[0]
-
-        if week_type != "all":
-            result = self.cursor.execute(
-                "SELECT image_path FROM schedule_images WHERE day_of_week = ? AND week_type = 'all'",
-                (day_of_week,)
-            ).fetchone()
-            return result[0] if result else None
+        # Свой курсор на запрос: метод вызывается и из рабочих потоков
+        # Фото для типа недели, а если его нет — общее, одним запросом
+        result = self.connection.execute("""
+            SELECT image_path FROM schedule_images
+            WHERE group_name = ? AND day_of_week = ? AND week_type IN (?, 'all')
+            ORDER BY week_type = 'all'
+            LIMIT 1
+        """, (group_name, day_of_week, week_type)).fetchone()
 
-        return None
+        return result[0] if result else None
 
     # === МЕТОДЫ ДЛЯ НЕДЕЛЬНОГО РАСПИСАНИЯ ===
-    def add_week_schedule(self, image_path: str, week_type: str = "all"):
+    def add_week_schedule(self, image_path: str, week_type: str = "all", group_name: str = DEFAULT_GROUP):
         """Добавляет фото расписания на всю неделю"""
         self.cursor.execute(
-            "DELETE FROM week_schedule WHERE week_type = ?",
-            (week_type,)
+            "DELETE FROM week_schedule WHERE group_name = ? AND week_type = ?",
+            (group_name, week_type)
         )
 
         self.cursor.execute(
-            "INSERT INTO week_schedule (image_path, week_type) VALUES (?, ?)",
-            (image_path, week_type)
+            "INSERT INTO week_schedule (group_name, image_path, week_type) VALUES (?, ?, ?)",
+            (group_name, image_path, week_type)
         )
 
+        self.bump_data_version()
         self.connection.commit()
 
-    def get_week_schedule(self, week_type: str = "all"):
+    def get_week_schedule(self, week_type: str = "all", group_name: str = DEFAULT_GROUP):
         """Получает фото недельного расписания"""
-        result = self.cursor.execute(
-            "SELECT image_path FROM week_schedule WHERE week_type = ?",
-            (week_type,)
-        ).fetchone()
-        if result:
-            return result[0]
-        if week_type != "all":
-            result = self.cursor.execute(
-                "SELECT image_path FROM week_schedule WHERE week_type = 'all'",
-            ).fetchone()
-            return result[0] if result else None
-        return None
+        result = self.connection.execute("""
+            SELECT image_path FROM week_schedule
+            WHERE group_name = ? AND week_type IN (?, 'all')
+            ORDER BY week_type = 'all'
+            LIMIT 1
+        """, (group_name, week_type)).fetchone()
+        return result[0] if result else None
 
     # === МЕТОДЫ ДЛЯ АКТУАЛЬНОГО РАСПИСАНИЯ ===
-    def add_actual_schedule_image(self, date: str, image_path: str, expires_at: str = None):
+    def add_actual_schedule_image(self, date: str, image_path: str, expires_at: str = None,
+                                  group_name: str = DEFAULT_GROUP):
         """Добавляет актуальное фото расписания на дату"""
-        self.cursor.execute("DELETE FROM actual_schedule_images WHERE date = ?", (date,))
         self.cursor.execute(
-            "INSERT INTO actual_schedule_images (date, image_path, expires_at) VALUES (?, ?, ?)",
-            (date, image_path, expires_at)
+            "DELETE FROM actual_schedule_images WHERE group_name = ? AND date = ?",
+            (group_name, date)
+        )
+        self.cursor.execute(
+            "INSERT INTO actual_schedule_images (group_name, date, image_path, expires_at) VALUES (?, ?, ?, ?)",
+            (group_name, date, image_path, expires_at)
         )
+        self.bump_data_version()
         self.connection.commit()
 
-    def get_actual_schedule_image(self, date: str):
+    def get_actual_schedule_image(self, date: str, group_name: str = DEFAULT_GROUP):
         """Получает актуальное фото расписания на дату"""
-        result = self.cursor.execute(
-            "SELECT image_path FROM actual_schedule_images WHERE date = ?",
-            (date,)
+        result = self.connection.execute(
+            "SELECT image_path FROM actual_schedule_images WHERE group_name = ? AND date = ?",
+            (group_name, date)
         ).fetchone()
 
         return result[0] if result else None
 
-    def add_base_schedule(self, day_of_week: int, lessons: list):
+    def get_image_refcounts(self) -> dict:
+        """Считает ссылки на каждый файл фото из всех таблиц расписаний"""
+        rows = self.connection.execute("""
+            SELECT image_path, COUNT(*) FROM (
+                SELECT image_path FROM schedule_images
+                UNION ALL
+                SELECT image_path FROM actual_schedule_images
+                UNION ALL
+                SELECT image_path FROM week_schedule
+            )
+            WHERE image_path IS NOT NULL
+            GROUP BY image_path
+        """).fetchall()
+        return dict(rows)
+
+    def add_media_file_id(self, image_path: str, file_id: str):
+        """Запоминает file_id загруженного в Telegram фото"""
+        self.cursor.execute("""
+            INSERT INTO media_file_ids (image_path, file_id) VALUES (?, ?)
+            ON CONFLICT(image_path) DO UPDATE SET file_id = excluded.file_id
+        """, (image_path, file_id))
+        self.connection.commit()
+
+    def get_media_file_ids(self) -> dict:
+        return dict(self.connection.execute(
+            "SELECT image_path, file_id FROM media_file_ids"
+        ).fetchall())
+
+    # === МЕТОДЫ ДЛЯ СНИМКА РАСПИСАНИЙ ===
+    def bump_data_version(self):
+        """Отмечает изменение расписаний; фиксируется вместе с изменением"""
+        self.cursor.execute("UPDATE meta SET value = value + 1 WHERE key = 'data_version'")
+
+    def get_data_version(self) -> int:
+        result = self.connection.execute(
+            "SELECT value FROM meta WHERE key = 'data_version'"
+        ).fetchone()
+        return result[0] if result else 0
+
+    def load_schedule_metadata(self) -> dict:
+        """Читает все таблицы расписаний для снимка в памяти"""
+        # Версию читаем первой: если запись успеет пройти между запросами,
+        # снимок просто перечитается при следующей проверке
+        version = self.get_data_version()
+        return {
+            "version": version,
+            "schedule_images": self.connection.execute(
+                "SELECT group_name, day_of_week, week_type, image_path FROM schedule_images"
+            ).fetchall(),
+            "week_schedule": self.connection.execute(
+                "SELECT group_name, week_type, image_path FROM week_schedule"
+            ).fetchall(),
+            "actual_schedule_images": self.connection.execute(
+                "SELECT group_name, date, image_path FROM actual_schedule_images"
+            ).fetchall(),
+            "base_schedule": self.connection.execute("""
+                SELECT group_name, day_of_week, lesson_number, subject, teacher, classroom, time_start, time_end
+                FROM base_schedule
+                ORDER BY group_name, day_of_week, lesson_number
+            """).fetchall(),
+        }
+
+    def add_base_schedule(self, day_of_week: int, lessons: list, group_name: str = DEFAULT_GROUP):
         self.cursor.execute(
-            "DELETE FROM base_schedule WHERE day_of_week = ?",
-            (day_of_week,)
+            "DELETE FROM base_schedule WHERE group_name = ? AND day_of_week = ?",
+            (group_name, day_of_week)
         )
 
         for lesson in lessons:
             self.cursor.execute("""
                 INSERT INTO base_schedule 
-                (day_of_week, lesson_number, subject, classroom, time_start, time_end)
-                VALUES (?, ?, ?, ?, ?, ?)
+                (group_name, day_of_week, lesson_number, subject, classroom, time_start, time_end)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
             """, (
+                group_name,
                 day_of_week,
                 lesson.get('number'),
                 lesson.get('subject'),
@@ -269,49 +424,54 @@ class Database:
                 lesson.get('time_end')
             ))
 
+        self.bump_data_version()
         self.connection.commit()
 
-    def get_schedule_for_day(self, day_of_week: int):
+    def get_schedule_for_day(self, day_of_week: int, group_name: str = DEFAULT_GROUP):
         return self.cursor.execute("""
             SELECT * FROM base_schedule 
-            WHERE day_of_week = ? 
+            WHERE group_name = ? AND day_of_week = ? 
             ORDER BY lesson_number
-        """, (day_of_week,)).fetchall()
+        """, (group_name, day_of_week)).fetchall()
 
-    def get_actual_schedule_for_date(self, date: str):
+    def get_actual_schedule_for_date(self, date: str, group_name: str = DEFAULT_GROUP):
         return self.cursor.execute("""
             SELECT * FROM actual_schedule 
-            WHERE date = ? AND is_active = 1
+            WHERE group_name = ? AND date = ? AND is_active = 1
             ORDER BY lesson_number
-        """, (date,)).fetchall()
+        """, (group_name, date)).fetchall()
 
-    def get_today_schedule(self):
+    def get_today_schedule(self, group_name: str = DEFAULT_GROUP):
         from datetime import datetime
         today = datetime.now()
         day_of_week = today.weekday()
         date_str = today.strftime("%Y-%m-%d")
-        actual = self.get_actual_schedule_for_date(date_str)
+        actual = self.get_actual_schedule_for_date(date_str, group_name)
         if actual:
             return actual, True
-        base = self.get_schedule_for_day(day_of_week)
+        base = self.get_schedule_for_day(day_of_week, group_name)
         return base, False
 
-    def get_tomorrow_schedule(self):
+    def get_tomorrow_schedule(self, group_name: str = DEFAULT_GROUP):
         from datetime import datetime, timedelta
         tomorrow = datetime.now() + timedelta(days=1)
         day_of_week = tomorrow.weekday()
         date_str = tomorrow.strftime("%Y-%m-%d")
 
-        actual = self.get_actual_schedule_for_date(date_str)
+        actual = self.get_actual_schedule_for_date(date_str, group_name)
         if actual:
             return actual, True
 
-        base = self.get_schedule_for_day(day_of_week)
+        base = self.get_schedule_for_day(day_of_week, group_name)
         return base, False
 
-    def add_actual_schedule(self, date: str, lessons: list, expires_at: str = None):
+    def add_actual_schedule(self, date: str, lessons: list, expires_at: str = None,
+                            group_name: str = DEFAULT_GROUP):
         # Удаляем старые записи на эту дату
-        self.cursor.execute("DELETE FROM actual_schedule WHERE date = ?", (date,))
+        self.cursor.execute(
+            "DELETE FROM actual_schedule WHERE group_name = ? AND date = ?",
+            (group_name, date)
+        )
 
         from datetime import datetime
         day_of_week = datetime.strptime(date, "%Y-%m-%d").weekday()
@@ -319,10 +479,11 @@ class Database:
         for lesson in lessons:
             self.cursor.execute("""
                 INSERT INTO actual_schedule 
-                (date, day_of_week, lesson_number, subject, classroom, 
+                (group_name, date, day_of_week, lesson_number, subject, classroom, 
                  time_start, time_end, expires_at)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
             """, (
+                group_name,
                 date,
                 day_of_week,
                 lesson.get('number'),
@@ -337,30 +498,153 @@ class Database:
 
     # === МЕТОДЫ ДЛЯ ДОМАШНЕГО ЗАДАНИЯ ===
 
-    def add_homework(self, subject: str, task: str, date_due: str):
+    def add_homework(self, subject: str, task: str, date_due: str, group_name: str = DEFAULT_GROUP):
         """Добавляет домашнее задание"""
         self.cursor.execute("""
-            INSERT INTO homework (subject, task, date_due)
-            VALUES (?, ?, ?)
-        """, (subject, task, date_due))
+            INSERT INTO homework (group_name, subject, task, date_due)
+            VALUES (?, ?, ?, ?)
+        """, (group_name, subject, task, date_due))
         self.connection.commit()
 
-    def get_homework_for_date(self, date_due: str):
+    def get_homework_for_date(self, date_due: str, group_name: str = DEFAULT_GROUP):
         """Получает ДЗ на конкретную дату"""
         return self.cursor.execute("""
             SELECT * FROM homework 
-            WHERE date_due = ? AND is_active = 1
+            WHERE group_name = ? AND date_due = ? AND is_active = 1
             ORDER BY subject
-        """, (date_due,)).fetchall()
+        """, (group_name, date_due)).fetchall()
 
-    def get_latest_homework_by_subject(self, subject: str):
+    def get_latest_homework_by_subject(self, subject: str, group_name: str = DEFAULT_GROUP):
         """Получает последнее ДЗ по предмету"""
         return self.cursor.execute("""
             SELECT * FROM homework 
-            WHERE subject = ? AND is_active = 1
+            WHERE group_name = ? AND subject = ? AND is_active = 1
             ORDER BY date_due DESC 
             LIMIT 1
-        """, (subject,)).fetchone()
+        """, (group_name, subject)).fetchone()
+
+    # === МЕТОДЫ ДЛЯ КАЛЕНДАРЯ ===
+
+    def fill_calendar(self, days: list):
+        """Добавляет даты [(date, week_type)], не трогая уже настроенные"""
+        self.cursor.executemany(
+            "INSERT OR IGNORE INTO calendar (date, week_type) VALUES (?, ?)",
+            days
+        )
+        self.connection.commit()
+
+    def get_calendar(self, date_from: str, date_to: str):
+        """Получает дни календаря: [(date, week_type, is_override, is_holiday)]"""
+        return self.cursor.execute("""
+            SELECT date, week_type, is_override, is_holiday FROM calendar
+            WHERE date BETWEEN ? AND ?
+            ORDER BY date
+        """, (date_from, date_to)).fetchall()
+
+    def set_calendar_week_type(self, dates: list, week_type: str):
+        """Переопределяет тип недели для дат"""
+        self.cursor.executemany("""
+            INSERT INTO calendar (date, week_type, is_override) VALUES (?, ?, 1)
+            ON CONFLICT(date) DO UPDATE SET week_type = excluded.week_type, is_override = 1
+        """, [(date, week_type) for date in dates])
+        self.connection.commit()
+
+    def set_calendar_holiday(self, date: str, week_type: str, is_holiday: bool):
+        """Отмечает дату выходным или снимает отметку"""
+        self.cursor.execute("""
+            INSERT INTO calendar (date, week_type, is_holiday) VALUES (?, ?, ?)
+            ON CONFLICT(date) DO UPDATE SET is_holiday = excluded.is_holiday
+        """, (date, week_type, int(is_holiday)))
+        self.connection.commit()
+
+    # === МЕТОДЫ ДЛЯ СТАТИСТИКИ ===
+
+    def add_logs(self, rows: list):
+        """Пакетно записывает действия: [(user_id, action, timestamp)]"""
+        self.cursor.executemany(
+            "INSERT INTO logs (user_id, action, timestamp) VALUES (?, ?, ?)",
+            rows
+        )
+        self.connection.commit()
+
+    def get_logs_watermark(self) -> int:
+        result = self.cursor.execute(
+            "SELECT value FROM meta WHERE key = 'logs_watermark'"
+        ).fetchone()
+        return result[0] if result else 0
+
+    def rollup_logs(self, batch_size: int = 50000) -> int:
+        """Добавляет в сводки строки logs после водяной отметки; возвращает их число"""
+        watermark = self.get_logs_watermark()
+        upper, processed = self.cursor.execute("""
+            SELECT MAX(id), COUNT(*) FROM (
+                SELECT id FROM logs WHERE id > ? ORDER BY id LIMIT ?
+            )
+        """, (watermark, batch_size)).fetchone()
+        if not processed:
+            return 0
+
+        # Сводки и отметка фиксируются одной транзакцией: строки не посчитаются дважды
+        try:
+            self.cursor.execute("""
+                INSERT INTO logs_hourly (hour, action, hits)
+                SELECT strftime('%Y-%m-%d %H:00', timestamp), action, COUNT(*)
+                FROM logs
+                WHERE id > ? AND id <= ?
+                GROUP BY 1, 2
+                ON CONFLICT(hour, action) DO UPDATE SET hits = hits + excluded.hits
+            """, (watermark, upper))
+            self.cursor.execute("""
+                INSERT INTO logs_daily_users (day, user_id, action, hits)
+                SELECT date(timestamp), user_id, action, COUNT(*)
+                FROM logs
+                WHERE id > ? AND id <= ?
+                GROUP BY 1, 2, 3
+                ON CONFLICT(day, user_id, action) DO UPDATE SET hits = hits + excluded.hits
+            """, (watermark, upper))
+            self.cursor.execute("""
+                INSERT INTO meta (key, value) VALUES ('logs_watermark', ?)
+                ON CONFLICT(key) DO UPDATE SET value = excluded.value
+            """, (upper,))
+            self.connection.commit()
+        except Exception:
+            self.connection.rollback()
+            raise
+        return processed
+
+    def prune_logs(self, keep_days: int) -> int:
+        """Удаляет сырые логи старше keep_days, уже учтённые в сводках"""
+        self.cursor.execute("""
+            DELETE FROM logs
+            WHERE id <= ? AND timestamp < datetime('now', ?)
+        """, (self.get_logs_watermark(), f"-{keep_days} days"))
+        self.connection.commit()
+        return self.cursor.rowcount
+
+    def get_usage_stats(self, days: int = 7) -> dict:
+        """Статистика за последние дни — только из сводок, без чтения сырых логов"""
+        since = f"-{days} days"
+        return {
+            "actions": self.connection.execute("""
+                SELECT action, SUM(hits) FROM logs_hourly
+                WHERE hour >= strftime('%Y-%m-%d %H:00', 'now', ?)
+                GROUP BY action
+                ORDER BY 2 DESC
+            """, (since,)).fetchall(),
+            "daily": self.connection.execute("""
+                SELECT day, COUNT(DISTINCT user_id), SUM(hits) FROM logs_daily_users
+                WHERE day >= date('now', ?)
+                GROUP BY day
+                ORDER BY day
+            """, (since,)).fetchall(),
+            "top_users": self.connection.execute("""
+                SELECT user_id, SUM(hits) FROM logs_daily_users
+                WHERE day >= date('now', ?)
+                GROUP BY user_id
+                ORDER BY 2 DESC
+                LIMIT 5
+            """, (since,)).fetchall(),
+        }
 
     # === СЛУЖЕБНЫЕ МЕТОДЫ ===
 
@@ -372,9 +656,11 @@ class Database:
         self.connection.commit()
 
     def close(self):
+        self.connection.commit()
         self.connection.close()
+        logger.info("База данных закрыта")
 
     def backup(self, backup_file="backup.db"):
         import shutil
         shutil.copy2("bot_database.db", backup_file)
-        logger.info(f"Создана резервная копия: {backup_file}")
\ No newline at end of file
+        logger.info("Создана резервная копия: %s", backup_file)
\ No newline at end of file
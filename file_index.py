@@ -0,0 +1,66 @@
+import hashlib
+import logging
+import os
+from collections import namedtuple
+
+logger = logging.getLogger(__name__)
+
+FileInfo = namedtuple("FileInfo", ["path", "size", "mtime", "sha256"])
+
+
+class FileIndex:
+    """Индекс файлов папки schedules/ в памяти, чтобы не трогать диск в обработчиках"""
+
+    def __init__(self, root="schedules"):
+        self.root = root
+        self._files = {}  # {path: FileInfo}
+
+    def _describe(self, path: str) -> FileInfo:
+        stat = os.stat(path)
+        name = os.path.basename(path)
+        digest, ext = os.path.splitext(name)
+        # Имя файла из хранилища и есть его хэш — не перечитываем содержимое
+        if ext != ".jpg" or len(digest) != 64:
+            with open(path, "rb") as f:
+                digest = hashlib.sha256(f.read()).hexdigest()
+        return FileInfo(path, stat.st_size, stat.st_mtime, digest)
+
+    def build(self):
+        """Сканирует папку целиком; блокирующий вызов, запускать через to_thread"""
+        files = {}
+        os.makedirs(self.root, exist_ok=True)
+        for dirpath, _, names in os.walk(self.root):
+            for name in names:
+                if name.endswith(".tmp"):
+                    continue
+                path = os.path.join(dirpath, name).replace(os.sep, "/")
+                files[path] = self._describe(path)
+        self._files = files
+        logger.info("Проиндексировано файлов расписания: %d", len(files))
+
+    def add(self, path: str):
+        self._files[path] = self._describe(path)
+
+    def sync(self, referenced):
+        """Сверяет индекс с диском для путей из снимка и уже известных файлов.
+
+        Файлы могли добавить или удалить другие процессы; блокирующий вызов.
+        """
+        files = dict(self._files)
+        for path in set(referenced) | set(files):
+            if os.path.exists(path):
+                if path not in files:
+                    files[path] = self._describe(path)
+            else:
+                files.pop(path, None)
+        # Подменяем целиком — читатели в event loop не видят полуобновлённый индекс
+        self._files = files
+
+    def discard(self, path: str):
+        self._files.pop(path, None)
+
+    def exists(self, path: str) -> bool:
+        return path in self._files
+
+    def get(self, path: str):
+        return self._files.get(path)
@@ -0,0 +1,63 @@
+import hashlib
+import logging
+import os
+import tempfile
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class ImageStore:
+    """Хранилище фото расписаний по хэшу содержимого"""
+
+    def __init__(self, root="schedules/blobs", gc_grace_seconds=3600):
+        self.root = root
+        # Свежие файлы не удаляем: ссылка на них может ещё не попасть в БД
+        self.gc_grace_seconds = gc_grace_seconds
+        os.makedirs(root, exist_ok=True)
+
+    def path_for(self, digest: str) -> str:
+        return f"{self.root}/{digest}.jpg"
+
+    def put(self, data: bytes) -> str:
+        """Сохраняет фото и возвращает путь; одинаковые фото хранятся один раз"""
+        digest = hashlib.sha256(data).hexdigest()
+        path = self.path_for(digest)
+        if os.path.exists(path):
+            # Продлеваем льготный срок: иначе сборщик мусора может удалить
+            # старый файл без ссылок до того, как ссылка на него попадёт в БД
+            try:
+                os.utime(path)
+                return path
+            except FileNotFoundError:
+                pass  # файл успели удалить — запишем заново
+
+        # Пишем во временный файл и атомарно переименовываем,
+        # чтобы читатели никогда не видели недописанное фото
+        fd, tmp_path = tempfile.mkstemp(dir=self.root, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        logger.info("Сохранено фото %s", path)
+        return path
+
+    def collect_garbage(self, referenced) -> list:
+        """Удаляет фото, на которые нет ссылок в БД"""
+        removed = []
+        deadline = time.time() - self.gc_grace_seconds
+        for entry in os.scandir(self.root):
+            path = f"{self.root}/{entry.name}"
+            if path in referenced or entry.stat().st_mtime > deadline:
+                continue
+            os.remove(path)
+            removed.append(path)
+        if removed:
+            logger.info("Удалено неиспользуемых фото: %d", len(removed))
+        return removed
@@ -0,0 +1,55 @@
+from datetime import date, datetime, timedelta
+
+DAY_ALIASES = {
+    "пн": 0, "понедельник": 0,
+    "вт": 1, "вторник": 1,
+    "ср": 2, "среда": 2,
+    "чт": 3, "четверг": 3,
+    "пт": 4, "пятница": 4,
+    "сб": 5, "суббота": 5,
+}
+
+
+def parse_inline_query(text: str, today: date) -> list:
+    """Разбирает запрос: [('date', date)] или [('weekday', 0-5)]"""
+    text = text.strip().lower()
+    if not text:
+        return [("date", today), ("date", today + timedelta(days=1))]
+    if text == "сегодня":
+        return [("date", today)]
+    if text == "завтра":
+        return [("date", today + timedelta(days=1))]
+    if text in DAY_ALIASES:
+        return [("weekday", DAY_ALIASES[text])]
+    if text.isdigit() and 0 <= int(text) <= 5:
+        return [("weekday", int(text))]
+    return []
+
+
+def inline_cache_time(targets: list, now: datetime) -> int:
+    """Сколько Telegram может кэшировать ответ у себя"""
+    if any(kind == "date" for kind, _ in targets):
+        # «Сегодня» и «завтра» меняются в полночь
+        expires = now.date() + timedelta(days=1)
+    else:
+        # Для дня недели в понедельник меняется чётность недели
+        expires = now.date() + timedelta(days=7 - now.weekday())
+    left = (datetime.combine(expires, datetime.min.time()) - now).total_seconds()
+    return int(min(max(left, 60), 3600))
+
+
+class InlineResultCache:
+    """Готовые ответы на inline-запросы, пока не сменились данные или дата"""
+
+    def __init__(self):
+        self._stamp = None
+        self._results = {}  # {(group, запрос): [InlineQueryResult...]}
+
+    def get_or_build(self, stamp, key, build):
+        if stamp != self._stamp:
+            self._results = {}
+            self._stamp = stamp
+        results = self._results.get(key)
+        if results is None:
+            results = self._results[key] = build()
+        return results
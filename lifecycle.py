@@ -0,0 +1,53 @@
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class Lifecycle:
+    """Учёт обрабатываемых обновлений и плавная остановка бота"""
+
+    def __init__(self):
+        self.accepting = True
+        self.last_update_id = None  # самый большой update_id среди обработанных
+        self._tasks = set()  # задачи обновлений, которые сейчас обрабатываются
+        self._idle = asyncio.Event()
+        self._idle.set()
+
+    @property
+    def in_flight(self) -> int:
+        return len(self._tasks)
+
+    async def middleware(self, handler, event, data: dict):
+        """Внешний middleware обновлений: учитывает их до конца обработки"""
+        task = asyncio.current_task()
+        self._tasks.add(task)
+        self._idle.clear()
+        try:
+            return await handler(event, data)
+        finally:
+            self._tasks.discard(task)
+            if self.last_update_id is None or event.update_id > self.last_update_id:
+                self.last_update_id = event.update_id
+            if not self._tasks:
+                self._idle.set()
+
+    def begin_shutdown(self):
+        self.accepting = False
+
+    async def drain(self, timeout: float) -> bool:
+        """Ждёт начатые обновления не дольше timeout секунд, оставшиеся отменяет"""
+        self.begin_shutdown()
+        if self._tasks:
+            logger.info("Ожидаем завершения обновлений: %d", len(self._tasks))
+        try:
+            await asyncio.wait_for(self._idle.wait(), timeout)
+            return True
+        except asyncio.TimeoutError:
+            logger.warning("Не дождались %d обновлений за %.0f с, отменяем", len(self._tasks), timeout)
+        # Отменённые обработчики не должны дожить до закрытия БД и сессии
+        tasks = list(self._tasks)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        return False
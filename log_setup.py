@@ -0,0 +1,86 @@
+import copy
+import json
+import logging
+import logging.handlers
+import queue
+import random
+import sys
+
+# Поля, которые обработчики передают через extra=
+STRUCTURED_FIELDS = ("event", "update_id", "event_type", "handler", "user_id", "duration_ms")
+
+
+class JsonFormatter(logging.Formatter):
+    """Одна запись лога — одна строка JSON"""
+
+    def format(self, record):
+        data = {
+            "ts": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        for field in STRUCTURED_FIELDS:
+            value = getattr(record, field, None)
+            if value is not None:
+                data[field] = value
+        if record.exc_info:
+            data["exc"] = self.formatException(record.exc_info)
+        return json.dumps(data, ensure_ascii=False, default=str)
+
+
+class RecordQueueHandler(logging.handlers.QueueHandler):
+    """Кладёт в очередь саму запись: JSON и трейсбек собираются в потоке слушателя.
+
+    Стандартный prepare форматирует запись в вызывающем потоке и стирает
+    exc_info, из-за чего пропадали поля и трейсбек.
+    """
+
+    def prepare(self, record):
+        record = copy.copy(record)
+        # Аргументы подставляем сразу: к моменту записи объекты могут измениться
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+
+class SamplingFilter(logging.Filter):
+    """Пропускает только долю частых событий (по полю event)"""
+
+    def __init__(self, rates: dict):
+        super().__init__()
+        self.rates = rates  # {event: доля от 0 до 1}
+
+    def filter(self, record):
+        rate = self.rates.get(getattr(record, "event", None))
+        return rate is None or random.random() < rate
+
+
+def parse_sample_rates(value: str) -> dict:
+    """'update=0.1,telegram_request=0.5' -> {'update': 0.1, 'telegram_request': 0.5}"""
+    rates = {}
+    for item in filter(None, (part.strip() for part in value.split(","))):
+        event, _, rate = item.partition("=")
+        rates[event.strip()] = float(rate)
+    return rates
+
+
+def setup_logging(level="INFO", sample_rates=None) -> logging.handlers.QueueListener:
+    """Логи пишутся через очередь в отдельном потоке, чтобы не блокировать event loop"""
+    log_queue = queue.SimpleQueue()
+    stream_handler = logging.StreamHandler(sys.stdout)
+    stream_handler.setFormatter(JsonFormatter())
+    listener = logging.handlers.QueueListener(log_queue, stream_handler, respect_handler_level=True)
+
+    queue_handler = RecordQueueHandler(log_queue)
+    # Отбрасываем лишние записи до постановки в очередь
+    queue_handler.addFilter(SamplingFilter(sample_rates or {}))
+
+    root = logging.getLogger()
+    root.handlers[:] = [queue_handler]
+    root.setLevel(level)
+    logging.getLogger('aiogram').setLevel(logging.WARNING)
+    logging.getLogger('asyncio').setLevel(logging.WARNING)
+
+    listener.start()
+    return listener
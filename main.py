@@ -1,41 +1,163 @@
-import os, logging, asyncio
+import os, logging, asyncio, time, hmac, html
 from aiogram import Bot, Dispatcher, types
 from aiogram.filters import Command
-from aiogram.types import ReplyKeyboardMarkup, KeyboardButton, InlineKeyboardMarkup, InlineKeyboardButton, FSInputFile
+from aiogram.types import (FSInputFile, InputMediaPhoto, BufferedInputFile,
+    InlineQueryResultCachedPhoto, InlineQueryResultsButton)
 from aiogram.utils.keyboard import InlineKeyboardBuilder
 from aiogram.enums import ParseMode
-from database import Database
+from database import Database, DEFAULT_GROUP
+from coalesce import SingleFlight
+from image_store import ImageStore
+from file_index import FileIndex
+from telegram_client import create_session
+from school_calendar import SchoolCalendar
+from snapshot import SnapshotCache
+from lifecycle import Lifecycle
+from analytics import UsageAnalytics
+from inline_results import InlineResultCache, parse_inline_query, inline_cache_time
+import templates
+from log_setup import setup_logging, parse_sample_rates
+from profiling import PhaseTimer, ProfilerSession, SlowUpdateRecorder, phase, record_phase
 from datetime import datetime, timedelta
 import threading
 from dotenv import load_dotenv
-from http.server import HTTPServer, BaseHTTPRequestHandler
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
 
 
 class HealthHandler(BaseHTTPRequestHandler):
     def do_GET(self):
-        self.send_response(200)
-        self.send_header('Content-type', 'text/plain')
+        url = urlparse(self.path)
+        if url.path in ('/profile', '/slow'):
+            self.handle_profiling(url.path, parse_qs(url.query))
+            return
+        if not lifecycle.accepting:
+            self.send_text(503, 'Draining')
+            return
+        self.send_text(200, 'OK')
+
+    def handle_profiling(self, path, query):
+        token = os.getenv("PROFILE_TOKEN")
+        # Без PROFILE_TOKEN эндпоинты профилирования выключены
+        if not token or not hmac.compare_digest(query.get('token', [''])[0], token):
+            self.send_text(404, 'Not found')
+            return
+        if path == '/slow':
+            self.send_text(200, slow_updates.report())
+            return
+        if bot_loop is None:
+            self.send_text(503, 'Bot is not running')
+            return
+        try:
+            seconds = float(query.get('seconds', ['10'])[0])
+            # Профилировать нужно поток event loop, поэтому сессия запускается в нём
+            future = asyncio.run_coroutine_threadsafe(profiler_session.run(seconds), bot_loop)
+            report = future.result(timeout=ProfilerSession.MAX_SECONDS + 10)
+        except Exception as e:
+            self.send_text(409, str(e))
+            return
+        self.send_text(200, report)
+
+    def send_text(self, code: int, text: str):
+        self.send_response(code)
+        self.send_header('Content-type', 'text/plain; charset=utf-8')
         self.end_headers()
-        self.wfile.write(b'OK')
+        self.wfile.write(text.encode())
+
     def log_message(self, format, *args):
         pass
 
 def run_health_server():
     port = int(os.getenv("PORT", 8080))
-    server = HTTPServer(('0.0.0.0', port), HealthHandler)
-    print(f"✅ Health check server started on port {port}")
+    server = ThreadingHTTPServer(('0.0.0.0', port), HealthHandler)
+    logger.info("Health check server started on port %s", port)
     server.serve_forever()
 
 
+load_dotenv()
+log_listener = setup_logging(
+    level=os.getenv("LOG_LEVEL", "INFO"),
+    sample_rates=parse_sample_rates(os.getenv("LOG_SAMPLE_RATES", "update=0.1")),
+)
 logger = logging.getLogger(__name__)
-logging.getLogger('aiogram').setLevel(logging.WARNING)
-logging.getLogger('asyncio').setLevel(logging.WARNING)
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
-db = Database()
+SLOW_UPDATE_MS = float(os.getenv("SLOW_UPDATE_MS", 1000))
+# Вызовы БД и файлового хранилища попадают в разбивку медленных обновлений
+db = PhaseTimer(Database(), "db")
+image_store = PhaseTimer(ImageStore(), "fs")
+slow_updates = SlowUpdateRecorder(size=int(os.getenv("SLOW_UPDATES_KEEP", 50)))
+profiler_session = ProfilerSession()
+bot_loop = None
+lifecycle = Lifecycle()
+analytics = UsageAnalytics(
+    Database(),
+    interval=float(os.getenv("STATS_ROLLUP_SECONDS", 60)),
+    keep_raw_days=int(os.getenv("LOGS_KEEP_DAYS", 30)),
+)
+SHUTDOWN_TIMEOUT = float(os.getenv("SHUTDOWN_TIMEOUT", 20))
+file_index = FileIndex()
+school_calendar = SchoolCalendar(db)
+schedule_cache = SnapshotCache(db, file_index)
 dp = Dispatcher()
-load_dotenv()
-bot = Bot(token=os.getenv("BOT_TOKEN"))
+session, telegram_retry = create_session(
+    max_connections=int(os.getenv("TG_MAX_CONNECTIONS", 100)),
+    max_concurrency=int(os.getenv("TG_MAX_CONCURRENCY", 20)),
+    max_retries=int(os.getenv("TG_MAX_RETRIES", 3)),
+)
+bot = Bot(token=os.getenv("BOT_TOKEN"), session=session)
 ADMIN_IDS = [5140862195, 5135358368]
+WEEK_TYPE_NAMES = {"all": "все недели", "even": "чётные недели", "odd": "нечётные недели"}
+upload_flight = SingleFlight()
+photo_file_ids = {}  # {image_path: file_id} — фото, уже загруженные в Telegram
+user_groups = {}  # {user_id: group_name}
+approved_users = set()
+inline_cache = InlineResultCache()
+week_albums = {}  # {(group, week_type): (пути фото, file_id фото альбома)}
+
+def log_slow_telegram_request(method_name: str, seconds: float, ok: bool):
+    if seconds > 1.0 or not ok:
+        logger.warning("Запрос к Telegram %s: %.2f с, %s", method_name, seconds, 'успех' if ok else 'ошибка',
+                       extra={"event": "telegram_request", "duration_ms": round(seconds * 1000, 2)})
+telegram_retry.add_timing_hook(log_slow_telegram_request)
+
+def record_telegram_phase(method_name: str, seconds: float, ok: bool):
+    record_phase("telegram", seconds)
+telegram_retry.add_timing_hook(record_telegram_phase)
+
+async def update_logging_middleware(handler, event: types.Update, data: dict):
+    """Логирует каждое обновление: тип, обработчик и длительность"""
+    update_info = data["update_info"] = {}
+    phases, phases_token = slow_updates.begin()
+    started = time.perf_counter()
+    try:
+        return await handler(event, data)
+    finally:
+        duration = time.perf_counter() - started
+        duration_ms = round(duration * 1000, 2)
+        slow = duration_ms > SLOW_UPDATE_MS
+        # Обычные обновления сэмплируются, медленные пишутся всегда
+        logger.log(logging.WARNING if slow else logging.INFO, "Обновление обработано", extra={
+            "event": "slow_update" if slow else "update",
+            "update_id": event.update_id,
+            "event_type": event.event_type,
+            "handler": update_info.get("handler"),
+            "user_id": update_info.get("user_id"),
+            "duration_ms": duration_ms,
+        })
+        slow_updates.finish(phases_token, phases, duration, update_id=event.update_id,
+                            event_type=event.event_type, handler=update_info.get("handler"))
+        if update_info.get("handler") and update_info.get("user_id"):
+            analytics.track(update_info["user_id"], update_info["handler"])
+dp.update.outer_middleware(lifecycle.middleware)
+dp.update.outer_middleware(update_logging_middleware)
+
+async def handler_name_middleware(handler, event, data: dict):
+    """Запоминает, какой обработчик сработал, для лога обновления"""
+    update_info = data.get("update_info")
+    if update_info is not None:
+        update_info["handler"] = data["handler"].callback.__name__
+        update_info["user_id"] = event.from_user.id if event.from_user else None
+    with phase("handler"):
+        return await handler(event, data)
 
 async def access_middleware(handler, event: types.Message, data: dict):
     user_id = event.from_user.id
@@ -57,6 +179,9 @@ async def access_middleware(handler, event: types.Message, data: dict):
         return None
     return await handler(event, data)
 dp.message.middleware(access_middleware)
+dp.message.middleware(handler_name_middleware)
+dp.callback_query.middleware(handler_name_middleware)
+dp.inline_query.middleware(handler_name_middleware)
 
 async def notify_admins_about_new_user(user_id: int, user_name: str):
     message_text = (
@@ -64,9 +189,9 @@ async def notify_admins_about_new_user(user_id: int, user_name: str):
     try:
         for admin_id in ADMIN_IDS:
             await bot.send_message(admin_id, message_text, parse_mode='Markdown')
-            logger.info(f"Уведомление админу {admin_id}")
+            logger.info("Уведомление админу %s", admin_id)
     except Exception as e:
-        logger.error(f"Ошибка отправки админу: {e}")
+        logger.error("Ошибка отправки админу: %s", e)
 
 async def notify_user_approved(user_id: int):
     try:
@@ -74,32 +199,193 @@ async def notify_user_approved(user_id: int):
             user_id,
             text="✅ *Ваша заявка одобрена!*\n\nИспользуйте /start для команд")
     except Exception as e:
-        logger.error(f"Не удалось уведомить {user_id}: {e}")
-
-box_start = ReplyKeyboardMarkup(
-    resize_keyboard=True,
-    one_time_keyboard=False,
-    keyboard=[
-        [
-            KeyboardButton(text='📅 Расписание'),
-            KeyboardButton(text='📚 ДЗ')
-        ]
-    ]
-)
+        logger.error("Не удалось уведомить %s: %s", user_id, e, extra={"user_id": user_id})
+
+def get_group(user_id: int) -> str:
+    """Группа пользователя; кэшируется до смены через /set_group"""
+    group = user_groups.get(user_id)
+    if group is None:
+        group = user_groups[user_id] = db.get_user_group(user_id)
+    return group
+
+def is_approved(user_id: int) -> bool:
+    """Одобрение не отзывается, поэтому положительный ответ кэшируется"""
+    if user_id in approved_users:
+        return True
+    if db.is_user_approved(user_id):
+        approved_users.add(user_id)
+        return True
+    return False
+
+def remember_file_id(image_path: str, file_id: str):
+    """Запоминает file_id фото в памяти и в БД, чтобы он пережил перезапуск"""
+    if photo_file_ids.get(image_path) != file_id:
+        photo_file_ids[image_path] = file_id
+        db.add_media_file_id(image_path, file_id)
+
+def resolve_date_image(group: str, date_str: str, day_of_week: int, week_type: str, is_holiday: bool):
+    """Находит фото на дату: сначала актуальное, потом основное (кроме выходных)"""
+    snapshot = schedule_cache.snapshot
+    image_path = snapshot.date_image(group, date_str)
+    if image_path and file_index.exists(image_path):
+        return image_path, True
+    if is_holiday:
+        return None, False
+    image_path = snapshot.day_image(group, day_of_week, week_type)
+    if image_path and file_index.exists(image_path):
+        return image_path, False
+    return None, False
+
+def resolve_day_image(group: str, day_of_week: int, week_type: str):
+    """Находит основное фото на день с учетом типа недели"""
+    image_path = schedule_cache.snapshot.day_image(group, day_of_week, week_type)
+    if image_path and file_index.exists(image_path):
+        return image_path
+    return None
+
+def store_image(data: bytes) -> str:
+    """Сохраняет фото в хранилище и сразу добавляет его в индекс файлов"""
+    path = image_store.put(data)
+    file_index.add(path)
+    return path
+
+def collect_image_garbage():
+    """Удаляет из хранилища фото, на которые больше нет ссылок"""
+    for path in image_store.collect_garbage(db.get_image_refcounts()):
+        file_index.discard(path)
+        photo_file_ids.pop(path, None)
+
+def resolve_week_images(group: str, week_type: str):
+    """Находит фото всех учебных дней недели: [(day_of_week, image_path)]"""
+    images = []
+    for day_num in range(6):
+        image_path = resolve_day_image(group, day_num, week_type)
+        if image_path:
+            images.append((day_num, image_path))
+    return images
+
+async def send_week_album(chat_id: int, group: str, week_type: str, images: list):
+    """Отправляет фото дней одним альбомом; file_id альбома кэшируются по типу недели"""
+    days = ["Понедельник", "Вторник", "Среда", "Четверг", "Пятница", "Суббота"]
+    paths = tuple(image_path for _, image_path in images)
+    key = (group, week_type)
+
+    def build_media(sources):
+        media = []
+        for (day_num, _), source in zip(images, sources):
+            caption = f"📅 <b>{days[day_num]}</b>"
+            if not media:
+                caption = f"🗓️ <b>Расписание на неделю</b>\n{caption}"
+            media.append(InputMediaPhoto(media=source, caption=caption, parse_mode=ParseMode.HTML))
+        return media
+
+    cached = week_albums.get(key)
+    if cached and cached[0] == paths:
+        return await bot.send_media_group(chat_id=chat_id, media=build_media(cached[1]))
+    async def send_files():
+        sources = [photo_file_ids.get(image_path) or FSInputFile(image_path) for image_path in paths]
+        return await bot.send_media_group(chat_id=chat_id, media=build_media(sources))
+    uploaded_here = False
+    async def upload():
+        nonlocal uploaded_here
+        uploaded_here = True
+        return await send_files()
+    # Альбом пересобирается, только если изменилось фото какого-то дня
+    try:
+        sent = await upload_flight.do(("album", key, paths), upload)
+    except Exception as e:
+        if uploaded_here:
+            raise
+        # Общая отправка не удалась в чужом чате — отправляем альбом сами
+        logger.warning("Общая отправка альбома %s не удалась (%s), отправляем сами", key, e)
+        sent = await send_files()
+        uploaded_here = True
+    file_ids = [m.photo[-1].file_id for m in sent]
+    week_albums[key] = (paths, file_ids)
+    for image_path, file_id in zip(paths, file_ids):
+        remember_file_id(image_path, file_id)
+    if uploaded_here:
+        return sent
+    return await bot.send_media_group(chat_id=chat_id, media=build_media(file_ids))
+
+async def send_schedule_photo(chat_id: int, image_path: str, caption: str):
+    """Отправляет фото, переиспользуя file_id уже загруженного файла"""
+    file_id = photo_file_ids.get(image_path)
+    if file_id:
+        return await bot.send_photo(chat_id=chat_id, photo=file_id, caption=caption, parse_mode=ParseMode.HTML)
+    async def send_file():
+        return await bot.send_photo(chat_id=chat_id, photo=FSInputFile(image_path), caption=caption, parse_mode=ParseMode.HTML)
+    uploaded_here = False
+    async def upload():
+        nonlocal uploaded_here
+        uploaded_here = True
+        return await send_file()
+    try:
+        sent = await upload_flight.do(image_path, upload)
+    except Exception as e:
+        if uploaded_here:
+            raise
+        # Общая загрузка не удалась в чужом чате — этот чат может быть в порядке
+        logger.warning("Общая загрузка %s не удалась (%s), отправляем сами", image_path, e)
+        sent = await send_file()
+        remember_file_id(image_path, sent.photo[-1].file_id)
+        return sent
+    remember_file_id(image_path, sent.photo[-1].file_id)
+    if uploaded_here:
+        return sent
+    # Файл загрузил параллельный запрос — отправляем по готовому file_id
+    return await bot.send_photo(chat_id=chat_id, photo=photo_file_ids[image_path], caption=caption, parse_mode=ParseMode.HTML)
 
 @dp.message(Command("admin_schedule"))
 async def admin_schedule_panel(message: types.Message):
     if message.from_user.id not in ADMIN_IDS:
         return
-    days = ["Пн", "Вт", "Ср", "Чт", "Пт", "Сб", "Вс"]
-    builder = InlineKeyboardBuilder()
-    for i, day in enumerate(days):
-        builder.button(text=f"{day} 📅", callback_data=f"admin_schedule_day_{i}")
-    builder.button(text="📅 Сегодня", callback_data="admin_schedule_today")
-    builder.button(text="📅 Завтра", callback_data="admin_schedule_tomorrow")
-    builder.button(text="📅 На неделю", callback_data="admin_schedule_week")
-    builder.adjust(4, 3, 3)
-    await message.answer(text="⚙️ <b>Админ-панель: Расписание</b>\n\nВыберите действие:", parse_mode='HTML', reply_markup=builder.as_markup())
+    await message.answer(text=templates.ADMIN_SCHEDULE_TEXT, parse_mode='HTML', reply_markup=templates.ADMIN_SCHEDULE_KEYBOARD)
+
+
+@dp.message(Command("profile"))
+async def profile_command(message: types.Message):
+    if message.from_user.id not in ADMIN_IDS:
+        return
+    parts = message.text.split()
+    seconds = int(parts[1]) if len(parts) > 1 and parts[1].isdigit() else 10
+    if profiler_session.running:
+        await message.answer("⏳ Профилирование уже идёт")
+        return
+    await message.answer(f"⏱ Профилирую бота {min(max(seconds, 1), ProfilerSession.MAX_SECONDS)} с...")
+    report = await profiler_session.run(seconds)
+    await message.answer_document(BufferedInputFile(report.encode(), filename="profile.txt"),
+        caption="📊 <b>Профиль готов</b>", parse_mode='HTML')
+
+@dp.message(Command("slow"))
+async def slow_updates_command(message: types.Message):
+    if message.from_user.id not in ADMIN_IDS:
+        return
+    await message.answer(f"🐢 <b>Самые медленные обновления</b> (мс)\n\n<pre>{slow_updates.report(limit=15)}</pre>",
+        parse_mode='HTML')
+
+@dp.message(Command("stats"))
+async def stats_command(message: types.Message):
+    if message.from_user.id not in ADMIN_IDS:
+        return
+    parts = message.text.split()
+    days = int(parts[1]) if len(parts) > 1 and parts[1].isdigit() else 7
+    # Больше месяца по дням не помещается в одно сообщение (4096 символов)
+    days = min(max(days, 1), 31)
+    stats = db.get_usage_stats(days)
+    if not stats["actions"]:
+        await message.answer(f"📊 За {days} дн. действий пока нет")
+        return
+    response = f"📊 <b>Статистика за {days} дн.</b>\n\n<b>Действия:</b>\n"
+    for action, hits in stats["actions"]:
+        response += f"• {action} — {hits}\n"
+    response += "\n<b>По дням</b> (пользователей / действий):\n"
+    for day, users, hits in stats["daily"]:
+        response += f"{day}: {users} / {hits}\n"
+    response += "\n<b>Самые активные:</b>\n"
+    for user_id, hits in stats["top_users"]:
+        response += f"<code>{user_id}</code> — {hits}\n"
+    await message.answer(response, parse_mode='HTML')
 
 
 @dp.callback_query(lambda c: c.data.startswith('admin_schedule_') or c.data == 'back_to_admin_schedule')
@@ -126,8 +412,8 @@ async def handle_today_schedule_admin(callback: types.CallbackQuery):
     today = datetime.now()
     date_str = today.strftime("%Y-%m-%d")
     day_name = ["Понедельник", "Вторник", "Среда", "Четверг", "Пятница", "Суббота", "Воскресенье"][today.weekday()]
-    image_path = db.get_actual_schedule_image(date_str)
-    if image_path and os.path.exists(image_path):
+    image_path = schedule_cache.snapshot.date_image(get_group(callback.from_user.id), date_str)
+    if image_path and file_index.exists(image_path):
         photo = FSInputFile(image_path)
         await callback.message.answer_photo(
             photo=photo,
@@ -146,8 +432,8 @@ async def handle_tomorrow_schedule_admin(callback: types.CallbackQuery):
     tomorrow = datetime.now() + timedelta(days=1)
     date_str = tomorrow.strftime("%Y-%m-%d")
     day_name = ["Понедельник", "Вторник", "Среда", "Четверг", "Пятница", "Суббота", "Воскресенье"][tomorrow.weekday()]
-    image_path = db.get_actual_schedule_image(date_str)
-    if image_path and os.path.exists(image_path):
+    image_path = schedule_cache.snapshot.date_image(get_group(callback.from_user.id), date_str)
+    if image_path and file_index.exists(image_path):
         photo = FSInputFile(image_path)
         await callback.message.answer_photo(
             photo=photo, caption=f"📅 <b>Актуальное расписание на завтра ({date_str})</b>", parse_mode='HTML'
@@ -164,33 +450,20 @@ async def handle_tomorrow_schedule_admin(callback: types.CallbackQuery):
         )
 
 async def handle_day_schedule_admin(callback: types.CallbackQuery, day_num: int):
-    days = ["Понедельник", "Вторник", "Среда", "Четверг", "Пятница", "Суббота"]
-    day_name = days[day_num]
-    has_all = db.get_schedule_image(day_num, "all") and os.path.exists(db.get_schedule_image(day_num, "all"))
-    status_text = f"📅 <b>{day_name}</b>\n\n"
-    status_text += f"📁 Все недели: {'✅' if has_all else '❌'}\n"
-    builder = InlineKeyboardBuilder()
-    if has_all:
-        builder.button(text="👁️ Показать (все)", callback_data=f"show_day_{day_num}_all")
-    builder.button(text="📤 Загрузить (все)", callback_data=f"upload_day_{day_num}_all")
-    builder.button(text="↩️ Назад", callback_data="back_to_admin_schedule")
-    builder.adjust(2, 1)
-    await callback.message.edit_text(status_text, parse_mode='HTML', reply_markup=builder.as_markup())
+    image_path = schedule_cache.snapshot.day_image(get_group(callback.from_user.id), day_num, "all")
+    has_all = bool(image_path and file_index.exists(image_path))
+    await callback.message.edit_text(templates.day_admin_text(day_num, has_all), parse_mode='HTML',
+        reply_markup=templates.day_admin_keyboard(day_num, has_all))
 
 async def handle_week_schedule_admin(callback: types.CallbackQuery):
-    days = ["Пн", "Вт", "Ср", "Чт", "Пт", "Сб"]
-    status_text = "🗓️ <b>Статус расписания на неделю:</b>\n\n"
+    group = get_group(callback.from_user.id)
+    snapshot = schedule_cache.snapshot
+    statuses = []
     for day_num in range(6):
-        has_all = db.get_schedule_image(day_num, "all") and os.path.exists(db.get_schedule_image(day_num, "all"))
-        status_text += f"{days[day_num]}: {'✅' if has_all else '❌'}\n"
-    status_text += "\nНажмите на день для управления"
-    builder = InlineKeyboardBuilder()
-    for i, day in enumerate(days):
-        builder.button(text=f"{day}", callback_data=f"admin_schedule_day_{i}")
-    builder.button(text="📤 Загрузить всю неделю", callback_data="upload_whole_week")
-    builder.button(text="↩️ Назад", callback_data="back_to_admin_schedule")
-    builder.adjust(6, 1, 1)
-    await callback.message.edit_text(status_text, parse_mode='HTML', reply_markup=builder.as_markup())
+        image_path = snapshot.day_image(group, day_num, "all")
+        statuses.append(bool(image_path and file_index.exists(image_path)))
+    await callback.message.edit_text(templates.week_status_text(tuple(statuses)), parse_mode='HTML',
+        reply_markup=templates.WEEK_STATUS_KEYBOARD)
 
 @dp.callback_query(lambda c: c.data.startswith('upload_today_'))
 async def upload_today_callback(callback: types.CallbackQuery):
@@ -201,14 +474,8 @@ async def upload_today_callback(callback: types.CallbackQuery):
 
 @dp.callback_query(lambda c: c.data == 'upload_whole_week')
 async def upload_whole_week_callback(callback: types.CallbackQuery):
-    builder = InlineKeyboardBuilder()
-    builder.button(text="📤 Все недели", callback_data="upload_week_all")
-    builder.button(text="📤 Чётные недели", callback_data="upload_week_even")
-    builder.button(text="📤 Нечётные недели", callback_data="upload_week_odd")
-    builder.button(text="↩️ Назад", callback_data="back_to_admin_schedule")
-    builder.adjust(1, 1, 1, 1)
-    await callback.message.edit_text(text="📤 <b>Загрузка недельного расписания</b>\n\nВыберите тип недели:",
-        parse_mode='HTML', reply_markup=builder.as_markup())
+    await callback.message.edit_text(text=templates.UPLOAD_WEEK_TEXT, parse_mode='HTML',
+        reply_markup=templates.UPLOAD_WEEK_KEYBOARD)
     await callback.answer()
 
 @dp.callback_query(lambda c: c.data.startswith('upload_week_'))
@@ -218,12 +485,7 @@ async def upload_week_callback(callback: types.CallbackQuery):
         'type': 'week',
         'week_type': week_type
     }
-    week_type_names = {
-        "all": "все недели",
-        "even": "чётные недели",
-        "odd": "нечётные недели"
-    }
-    await callback.message.answer(text=f"🗓️ <b>Загрузка недельного расписания</b>\n\nТип: {week_type_names[week_type]}\n\n"
+    await callback.message.answer(text=f"🗓️ <b>Загрузка недельного расписания</b>\n\nТип: {WEEK_TYPE_NAMES[week_type]}\n\n"
         f"<i>Отправьте фото расписания на всю неделю...</i>",parse_mode='HTML')
     await callback.answer()
 
@@ -234,29 +496,13 @@ async def back_to_admin_schedule_handler(callback: types.CallbackQuery):
         await callback.answer("❌ Нет прав")
         return
     try:
-        keyboard = InlineKeyboardMarkup(inline_keyboard=[
-            [
-                InlineKeyboardButton(text="Пн 📅", callback_data="admin_schedule_day_0"),
-                InlineKeyboardButton(text="Вт 📅", callback_data="admin_schedule_day_1"),
-                InlineKeyboardButton(text="Ср 📅", callback_data="admin_schedule_day_2"),
-                InlineKeyboardButton(text="Чт 📅", callback_data="admin_schedule_day_3"),
-            ],
-            [
-                InlineKeyboardButton(text="Пт 📅", callback_data="admin_schedule_day_4"),
-                InlineKeyboardButton(text="Сб 📅", callback_data="admin_schedule_day_5"),
-                InlineKeyboardButton(text="Вс 📅", callback_data="admin_schedule_day_6"),
-            ],
-            [
-                InlineKeyboardButton(text="📅 Сегодня", callback_data="admin_schedule_today"),
-                InlineKeyboardButton(text="📅 Завтра", callback_data="admin_schedule_tomorrow"),
-                InlineKeyboardButton(text="📅 На неделю", callback_data="admin_schedule_week"),
-            ]
-        ])
-        await callback.message.edit_text(text="⚙️ <b>Админ-панель: Расписание</b>\n\nВыберите действие:", parse_mode='HTML', reply_markup=keyboard)
+        await callback.message.edit_text(text=templates.ADMIN_SCHEDULE_TEXT, parse_mode='HTML',
+            reply_markup=templates.ADMIN_SCHEDULE_KEYBOARD)
         await callback.answer("⬅️ Возврат в меню")
     except Exception as e:
-        print(f"Ошибка при редактировании: {e}")
-        await callback.message.answer(text="⚙️ <b>Админ-панель: Расписание</b>\n\nВыберите действие:", parse_mode='HTML', reply_markup=keyboard)
+        logger.warning("Ошибка при редактировании: %s", e)
+        await callback.message.answer(text=templates.ADMIN_SCHEDULE_TEXT, parse_mode='HTML',
+            reply_markup=templates.ADMIN_SCHEDULE_KEYBOARD)
         await callback.answer()
 
 @dp.message(lambda m: m.text == '⚙️ Админ-панель')
@@ -278,38 +524,11 @@ async def start(message: types.Message):
         status = db.get_user_status(user_id)
         if status == 'approved':
             if user_id in ADMIN_IDS:
-                admin_menu = ReplyKeyboardMarkup(
-                    resize_keyboard=True, keyboard=[
-                        [
-                            KeyboardButton(text='📅 Расписание'),
-                            KeyboardButton(text='⚙️ Редакция Расписания')
-                        ],
-                        [
-                            KeyboardButton(text='👥 Пользователи'),
-                            KeyboardButton(text='📚 ДЗ'),
-                        ]
-                    ]
-                )
-                await message.answer(text="👑 <b>Админ-панель</b>\n\n<b>Доступные команды:</b>\n"
-                    '┏━━━━━━━━━━━━━━━━━━━━━━━━━━━┓\n\n'
-                    f"• /admin_schedule - управление расписанием\n"
-                    f"• /users - список пользователей\n"
-                    f"• /broadcast - рассылка\n\n"
-                    '┗━━━━━━━━━━━━━━━━━━━━━━━━━━━┛\n'
-                    f"Или используйте кнопки ниже.\n\nДоброго времени суток, {full_name}! Вот список быстрых команд:\n\n"
-                    '┏━━━━━━━━━━━━━━━━━━━━━━━━━━━┓\n\n'
-                    '  ➀: [ /Schedule ] ― Нажми, чтобы увидеть расписание.\n'
-                    '  ➁: [ /HomeWork ] ― Нажми, чтобы узнать Д/З.\n'
-                    '┗━━━━━━━━━━━━━━━━━━━━━━━━━━━┛', parse_mode='HTML', reply_markup=admin_menu
-                )
+                await message.answer(text=templates.ADMIN_START_TEXT.format(full_name=full_name),
+                    parse_mode='HTML', reply_markup=templates.ADMIN_MENU)
             else:
-                await message.answer(parse_mode='HTML', reply_markup=box_start,
-                    text=f'Доброго времени суток, {full_name}! Вот список быстрых команд:\n\n'
-                         '┏━━━━━━━━━━━━━━━━━━━━━━━━━━━┓\n\n'
-                         '  ➀: [ /Schedule ] ― Нажми, чтобы увидеть расписание.\n'
-                         '  ➁: [ /HomeWork ] ― Нажми, чтобы узнать Д/З.\n'
-                         '┗━━━━━━━━━━━━━━━━━━━━━━━━━━━┛',
-                )
+                await message.answer(text=templates.USER_START_TEXT.format(full_name=full_name),
+                    parse_mode='HTML', reply_markup=templates.USER_MENU)
         else:
             await message.answer("⏳ Ваша заявка еще на рассмотрении.")
 
@@ -330,25 +549,20 @@ async def approve_user_command(message: types.Message):
 async def schedule_handler(message: types.Message):
     tomorrow = datetime.now() + timedelta(days=1)
     date_str = tomorrow.strftime("%Y-%m-%d")
-    image_path = db.get_actual_schedule_image(date_str)
-    if image_path and os.path.exists(image_path):
+    day_info = school_calendar.get(tomorrow.date())
+    group = get_group(message.from_user.id)
+    image_path, is_actual = resolve_date_image(
+        group, date_str, tomorrow.weekday(), day_info.week_type, day_info.is_holiday)
+    if image_path:
+        title = "Актуальное расписание" if is_actual else "Расписание"
         try:
-            photo = FSInputFile(image_path)
-            await bot.send_photo(chat_id=message.chat.id, photo=photo, caption=f"📅 <b>Актуальное расписание на {tomorrow.strftime('%d.%m.%Y')}</b>", parse_mode=ParseMode.HTML)
+            await send_schedule_photo(message.chat.id, image_path, f"📅 <b>{title} на {tomorrow.strftime('%d.%m.%Y')}</b>")
             return
         except Exception as e:
-            logging.error(f"Ошибка отправки фото: {e}")
-    day_of_week = tomorrow.weekday()
-    image_path = db.get_schedule_image(day_of_week)
-    if not image_path:
-        image_path = db.get_schedule_image(day_of_week)
-    if image_path and os.path.exists(image_path):
-        try:
-            photo = FSInputFile(image_path)
-            await bot.send_photo(chat_id=message.chat.id, photo=photo, caption=f"📅 <b>Расписание на {tomorrow.strftime('%d.%m.%Y')}</b>", parse_mode=ParseMode.HTML)
-            return
-        except Exception as e:
-            logging.error(f"Ошибка отправки фото: {e}")
+            logger.error("Ошибка отправки фото: %s", e)
+    if day_info.is_holiday:
+        await message.answer(text=f"🎉 <b>{tomorrow.strftime('%d.%m.%Y')} — выходной</b>", parse_mode=ParseMode.HTML)
+        return
     await message.answer(text="📅 <b>Расписание на {today.strftime('%d.%m.%Y')}</b>\n\nФото расписания пока не загружено.\nАдминистратор скоро его добавит!", parse_mode=ParseMode.HTML)
 
 @dp.message(Command("upload_schedule"))
@@ -367,8 +581,8 @@ upload_state = {}  # {user_id: {'type': 'day/date', 'day': 0, 'week_type': 'all'
 async def show_schedule_callback(callback: types.CallbackQuery):
     _, _, day_num, week_type = callback.data.split('_')
     day_num = int(day_num)
-    image_path = db.get_schedule_image(day_num, week_type)
-    if image_path and os.path.exists(image_path):
+    image_path = schedule_cache.snapshot.day_image(get_group(callback.from_user.id), day_num, week_type)
+    if image_path and file_index.exists(image_path):
         photo = FSInputFile(image_path)
         days = ["Понедельник", "Вторник", "Среда", "Четверг", "Пятница", "Суббота"]
         await callback.message.answer_photo(photo=photo, caption=f"📅 <b>{days[day_num]} ({week_type})</b>", parse_mode='HTML')
@@ -402,14 +616,19 @@ async def handle_photo_upload(message: types.Message):
     if user_id not in upload_state:
         return
     state = upload_state[user_id]
+    group = get_group(user_id)
     try:
-        os.makedirs("schedules", exist_ok=True)
         photo = message.photo[-1]
         file_id = photo.file_id
         file = await bot.get_file(file_id)
+        # Сначала сохраняем файл, потом ссылку в БД — читатели не увидят пустой путь
+        with phase("telegram"):
+            data = await bot.download_file(file.file_path)
+        filename = await asyncio.to_thread(store_image, data.getvalue())
+        # Путь зависит только от содержимого, поэтому file_id подходит навсегда
+        remember_file_id(filename, file_id)
         if state['type'] == 'day':
-            filename = f"schedules/day_{state['day']}_{state['week_type']}.jpg"
-            db.add_schedule_image(state['day'], filename, state['week_type'])
+            db.add_schedule_image(state['day'], filename, state['week_type'], group)
             days = ["Понедельник", "Вторник", "Среда", "Четверг", "Пятница", "Суббота"]
             builder = InlineKeyboardBuilder()
             builder.button(text="👁️ Показать", callback_data=f"show_day_{state['day']}_{state['week_type']}")
@@ -417,25 +636,71 @@ async def handle_photo_upload(message: types.Message):
             await message.answer(text=f"✅ <b>Расписание сохранено!</b>\n\nДень: {days[state['day']]}\n"
                 f"Тип недели: {state['week_type']}", parse_mode='HTML', reply_markup=builder.as_markup())
         elif state['type'] == 'week':  # ← ДОБАВЛЕНО ДЛЯ НЕДЕЛЬНОГО РАСПИСАНИЯ
-            filename = f"schedules/week_{state['week_type']}.jpg"
-            db.add_week_schedule(filename, state['week_type'])
-            week_type_names = {"all": "все недели"}
-            await message.answer(text=f"✅ <b>Недельное расписание сохранено!</b>\n\nТип: {week_type_names[state['week_type']]}\n\n"
+            db.add_week_schedule(filename, state['week_type'], group)
+            await message.answer(text=f"✅ <b>Недельное расписание сохранено!</b>\n\nТип: {WEEK_TYPE_NAMES[state['week_type']]}\n\n"
                 f"Теперь пользователи могут использовать команду /week", parse_mode='HTML')
         else:  # date
-            filename = f"schedules/date_{state['date']}.jpg"
-            db.add_actual_schedule_image(state['date'], filename)
+            db.add_actual_schedule_image(state['date'], filename, group_name=group)
             await message.answer(text=f"✅ <b>Актуальное расписание сохранено!</b>\n\nДата: {state['date']}\n"
                 f"Теперь пользователи увидят его при запросе.", parse_mode='HTML')
-        await bot.download_file(file.file_path, filename)
         del upload_state[user_id]
+        # Запись подняла версию данных — сразу подменяем снимок
+        await asyncio.to_thread(schedule_cache.refresh_if_stale)
+        await asyncio.to_thread(collect_image_garbage)
     except Exception as e:
         await message.answer(f"❌ <b>Ошибка:</b>\n{str(e)}", parse_mode='HTML')
 
+@dp.message(Command("week_type"))
+async def week_type_command(message: types.Message):
+    if message.from_user.id not in ADMIN_IDS:
+        return
+    parts = message.text.split()
+    try:
+        day = datetime.strptime(parts[1], "%Y-%m-%d").date()
+        if parts[2] not in ("even", "odd"):
+            raise ValueError
+    except (IndexError, ValueError):
+        await message.answer(text="🗓️ <b>Используйте:</b> /week_type [ГГГГ-ММ-ДД] [even|odd]\n\n"
+            "Тип меняется для всей недели, в которую входит дата.", parse_mode='HTML')
+        return
+    school_calendar.set_week_type(day, parts[2])
+    await message.answer(f"✅ Неделя с {day.strftime('%d.%m.%Y')}: {WEEK_TYPE_NAMES[parts[2]]}")
+
+@dp.message(Command("holiday"))
+async def holiday_command(message: types.Message):
+    if message.from_user.id not in ADMIN_IDS:
+        return
+    parts = message.text.split()
+    try:
+        day = datetime.strptime(parts[1], "%Y-%m-%d").date()
+    except (IndexError, ValueError):
+        await message.answer(text="🎉 <b>Используйте:</b> /holiday [ГГГГ-ММ-ДД]\n\n"
+            "Повторная команда снимает отметку выходного.", parse_mode='HTML')
+        return
+    is_holiday = not school_calendar.get(day).is_holiday
+    school_calendar.set_holiday(day, is_holiday)
+    await message.answer(f"✅ {day.strftime('%d.%m.%Y')}: {'выходной' if is_holiday else 'учебный день'}")
+
+@dp.message(Command("set_group"))
+async def set_group_command(message: types.Message):
+    if message.from_user.id not in ADMIN_IDS:
+        return
+    parts = message.text.split()
+    if len(parts) != 3 or not parts[1].isdigit():
+        await message.answer(text="👥 <b>Используйте:</b> /set_group [user_id] [группа]\n\n"
+            "Админ управляет расписанием своей группы — назначьте группу и себе.", parse_mode='HTML')
+        return
+    target_user_id, group = int(parts[1]), parts[2]
+    if not db.set_user_group(target_user_id, group):
+        await message.answer("❌ Пользователь не найден")
+        return
+    user_groups[target_user_id] = group
+    await message.answer(f"✅ Пользователь <code>{target_user_id}</code> переведён в группу <b>{html.escape(group)}</b>", parse_mode='HTML')
+
 @dp.message(lambda m: m.text == '👥 Пользователи')
 async def users_button(message: types.Message):
     if message.from_user.id in ADMIN_IDS:
-        db.cursor.execute("SELECT user_id, full_name, username, status FROM users")
+        db.cursor.execute("SELECT user_id, full_name, username, status, group_name FROM users")
         users = db.cursor.fetchall()
         if not users:
             await message.answer("📭 В базе данных нет пользователей.")
@@ -444,7 +709,7 @@ async def users_button(message: types.Message):
         pending_count = 0
         approved_count = 0
         for user in users:
-            user_id_db, full_name, username, status = user
+            user_id_db, full_name, username, status, group_name = user
             status_icon = "✅" if status == 'approved' else "⏳"
             if status == 'pending':
                 pending_count += 1
@@ -453,7 +718,7 @@ async def users_button(message: types.Message):
             response += f"{status_icon} <code>{user_id_db}</code> — {full_name}"
             if username:
                 response += f" (@{username})"
-            response += f" — <b>{status}</b>\n"
+            response += f" — <b>{status}</b> [{group_name or DEFAULT_GROUP}]\n"
         response += f"\n📊 <b>Статистика:</b>\n"
         response += f"✅ Одобрено: {approved_count}\n"
         response += f"⏳ Ожидают: {pending_count}\n"
@@ -469,23 +734,28 @@ async def schedule_button(message: types.Message):
 @dp.message(Command("week"))
 async def week_schedule_handler(message: types.Message):
     today = datetime.now()
-    image_path = db.get_week_schedule()
-    if not image_path:
-        image_path = db.get_week_schedule("all")
-    if image_path and os.path.exists(image_path):
+    group = get_group(message.from_user.id)
+    week_type = school_calendar.week_type(today.date())
+    image_path = schedule_cache.snapshot.week_image(group, week_type)
+    if image_path and file_index.exists(image_path):
         try:
-            photo = FSInputFile(image_path)
-            await bot.send_photo(chat_id=message.chat.id,photo=photo, caption=f"🗓️ <b>Расписание на неделю</b>\n",parse_mode='HTML')
+            await send_schedule_photo(message.chat.id, image_path, f"🗓️ <b>Расписание на неделю</b>\n")
             return
         except Exception as e:
-            logging.error(f"Ошибка отправки недельного фото: {e}")
+            logger.error("Ошибка отправки недельного фото: %s", e)
+    images = resolve_week_images(group, week_type)
+    # В альбоме должно быть хотя бы два фото
+    if len(images) >= 2:
+        try:
+            await send_week_album(message.chat.id, group, week_type, images)
+            return
+        except Exception as e:
+            logger.error("Ошибка отправки альбома на неделю: %s", e)
     days = ["Понедельник", "Вторник", "Среда", "Четверг", "Пятница", "Суббота"]
+    found_days = {day_num for day_num, _ in images}
     response = "🗓️ <b>Расписание на неделю:</b>\n\n"
     for day_num in range(6):
-        day_image = db.get_schedule_image(day_num)
-        if not day_image:
-            day_image = db.get_schedule_image(day_num, "all")
-        if day_image and os.path.exists(day_image):
+        if day_num in found_days:
             response += f"✅ {days[day_num]} — есть расписание\n"
         else:
             response += f"❌ {days[day_num]} — нет расписания\n"
@@ -506,28 +776,62 @@ async def day_schedule_handler(message: types.Message):
             return
         days = ["Понедельник", "Вторник", "Среда", "Четверг", "Пятница", "Суббота"]
         day_name = days[day_num]
-        today = datetime.now()
-        week_num = today.isocalendar()[1]
-        week_type = "even" if week_num % 2 == 0 else "odd"
-        image_path = db.get_schedule_image(day_num, week_type)
-        if not image_path:
-            image_path = db.get_schedule_image(day_num, "all")
-        if image_path and os.path.exists(image_path):
-            photo = FSInputFile(image_path)
-            await bot.send_photo(chat_id=message.chat.id, photo=photo,
-                caption=f"📅 <b>Расписание на {day_name}</b>\nНеделя: {'чётная' if week_type == 'even' else 'нечётная'}", parse_mode='HTML')
+        week_type = school_calendar.week_type(datetime.now().date())
+        group = get_group(message.from_user.id)
+        image_path = resolve_day_image(group, day_num, week_type)
+        if image_path:
+            await send_schedule_photo(message.chat.id, image_path,
+                f"📅 <b>Расписание на {day_name}</b>\nНеделя: {'чётная' if week_type == 'even' else 'нечётная'}")
         else:
             await message.answer(text=f"📅 <b>Расписание на {day_name}</b>\n\nНа этот день расписание пока не загружено.", parse_mode='HTML')
     except ValueError:
         await message.answer("❌ Используйте число: /day 0 (где 0 - понедельник)")
 
+def build_inline_results(group: str, targets: list, today):
+    days = ["Понедельник", "Вторник", "Среда", "Четверг", "Пятница", "Суббота"]
+    results = []
+    for kind, target in targets:
+        if kind == "date":
+            day_info = school_calendar.get(target)
+            image_path, _ = resolve_date_image(
+                group, target.isoformat(), target.weekday(), day_info.week_type, day_info.is_holiday)
+            title = f"{'Сегодня' if target == today else 'Завтра'}, {target.strftime('%d.%m.%Y')}"
+        else:
+            week_type = school_calendar.week_type(today)
+            image_path = resolve_day_image(group, target, week_type)
+            title = f"{days[target]} ({'чётная' if week_type == 'even' else 'нечётная'} неделя)"
+        file_id = photo_file_ids.get(image_path) if image_path else None
+        # Inline отдаёт только фото, уже загруженные в Telegram
+        if file_id:
+            results.append(InlineQueryResultCachedPhoto(
+                id=f"{kind}-{target}", photo_file_id=file_id, title=title,
+                caption=f"📅 <b>{title}</b>", parse_mode=ParseMode.HTML))
+    return results
+
+@dp.inline_query()
+async def inline_schedule_handler(inline_query: types.InlineQuery):
+    user_id = inline_query.from_user.id
+    if not is_approved(user_id):
+        await inline_query.answer([], cache_time=60, is_personal=True,
+            button=InlineQueryResultsButton(text="📝 Сначала отправьте /start", start_parameter="inline"))
+        return
+    now = datetime.now()
+    targets = parse_inline_query(inline_query.query, now.date())
+    group = get_group(user_id)
+    # Ответ пересобирается, только когда сменились данные, календарь, дата или появились новые file_id
+    stamp = (schedule_cache.snapshot.version, school_calendar.version, now.date(), len(photo_file_ids))
+    results = inline_cache.get_or_build(
+        stamp, (group, tuple(targets)), lambda: build_inline_results(group, targets, now.date()))
+    # is_personal: ответ зависит от группы и доступен только одобренным пользователям
+    await inline_query.answer(results, cache_time=inline_cache_time(targets, now), is_personal=True)
+
 @dp.message(lambda m: m.text == '📚 ДЗ')
 async def homework_handler(message: types.Message):
     await message.answer("📚 Функция ДЗ в разработке")
 
 @dp.callback_query()
 async def unknown_callback_handler(callback: types.CallbackQuery):
-    print(f"DEBUG: Неизвестный коллбэк: {callback.data}")
+    logger.debug("Неизвестный коллбэк: %s", callback.data)
     await callback.answer(f"❌ Кнопка '{callback.data}' еще не настроена", show_alert=True)
 
 @dp.message(Command("add_schedule"))
@@ -565,12 +869,53 @@ async def add_day_schedule(message: types.Message):
         await message.answer(f"❌ Ошибка: {str(e)}")
 
 
+async def on_shutdown():
+    # aiogram вызывает это по SIGTERM/SIGINT после остановки polling, но до закрытия сессии бота,
+    # поэтому начатые обновления ещё могут отправить ответы
+    logger.info("Остановка: дожидаемся начатых обновлений")
+    await lifecycle.drain(SHUTDOWN_TIMEOUT)
+    if lifecycle.last_update_id is None:
+        return
+    # aiogram подтверждает offset только следующим getUpdates — без этого Telegram
+    # отдаст последнюю пачку следующему запуску и обновления обработаются дважды
+    try:
+        await bot.get_updates(offset=lifecycle.last_update_id + 1, limit=1, timeout=0)
+    except Exception as e:
+        logger.warning("Не удалось подтвердить обработанные обновления: %s", e)
+dp.shutdown.register(on_shutdown)
+
+
 async def main():
+    global bot_loop
+    bot_loop = asyncio.get_running_loop()
     health_thread = threading.Thread(target=run_health_server, daemon=True)
     health_thread.start()
-
-    print("🚀 Telegram bot starting...")
-    await dp.start_polling(bot)
+    await asyncio.to_thread(collect_image_garbage)
+    await asyncio.to_thread(file_index.build)
+    await asyncio.to_thread(school_calendar.load)
+    await asyncio.to_thread(schedule_cache.load)
+    photo_file_ids.update(await asyncio.to_thread(db.get_media_file_ids))
+    # Версию проверяем в фоне: её могут поднять и другие процессы
+    snapshot_watch = asyncio.create_task(
+        schedule_cache.watch(float(os.getenv("SNAPSHOT_CHECK_SECONDS", 5))))
+    analytics_task = asyncio.create_task(analytics.run())
+
+    logger.info("Telegram bot starting...")
+    try:
+        await dp.start_polling(bot)
+    finally:
+        snapshot_watch.cancel()
+        analytics_task.cancel()
+        await asyncio.gather(snapshot_watch, analytics_task, return_exceptions=True)
+        # Дописываем буфер действий; блокировка дождётся прерванного фонового прохода
+        await asyncio.to_thread(analytics.run_once)
+        # Отмена задачи не останавливает её to_thread — ждём все рабочие потоки до закрытия БД
+        await asyncio.get_running_loop().shutdown_default_executor()
+        analytics.db.close()
+        db.close()
+        logger.info("Бот остановлен")
+        # Последним: дописывает очередь логов
+        log_listener.stop()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,118 @@
+import asyncio
+import contextvars
+import cProfile
+import heapq
+import io
+import itertools
+import pstats
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+# Фазы текущего обновления: {фаза: секунды}; to_thread копирует контекст,
+# поэтому время из рабочих потоков тоже попадает в обновление
+_current_phases = contextvars.ContextVar("update_phases", default=None)
+
+PHASES = ("middleware", "handler", "db", "fs", "telegram")
+
+
+def record_phase(name: str, seconds: float):
+    phases = _current_phases.get()
+    if phases is not None:
+        phases[name] = phases.get(name, 0.0) + seconds
+
+
+@contextmanager
+def phase(name: str):
+    """Засекает время блока как фазу текущего обновления"""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_phase(name, time.perf_counter() - started)
+
+
+class PhaseTimer:
+    """Прокси: каждый вызов метода объекта записывается в фазу обновления"""
+
+    def __init__(self, target, name: str):
+        self._target = target
+        self._name = name
+
+    def __getattr__(self, attr):
+        value = getattr(self._target, attr)
+        if not callable(value):
+            return value
+
+        def timed(*args, **kwargs):
+            with phase(self._name):
+                return value(*args, **kwargs)
+        return timed
+
+
+class SlowUpdateRecorder:
+    """Хранит N самых медленных обновлений с разбивкой по фазам"""
+
+    def __init__(self, size=50):
+        self.size = size
+        self._heap = []  # min-heap (duration, n, запись): вытесняется самое быстрое
+        self._counter = itertools.count()
+
+    def begin(self):
+        phases = {}
+        return phases, _current_phases.set(phases)
+
+    def finish(self, token, phases: dict, duration: float, **info):
+        _current_phases.reset(token)
+        if len(self._heap) >= self.size and duration <= self._heap[0][0]:
+            return
+        phases["middleware"] = max(duration - phases.get("handler", 0.0), 0.0)
+        record = dict(info, duration=duration, phases=phases, at=datetime.now())
+        item = (duration, next(self._counter), record)
+        if len(self._heap) < self.size:
+            heapq.heappush(self._heap, item)
+        else:
+            heapq.heapreplace(self._heap, item)
+
+    def report(self, limit=20) -> str:
+        records = [item[2] for item in sorted(self._heap, reverse=True)[:limit]]
+        if not records:
+            return "Медленных обновлений пока нет"
+        lines = []
+        for i, record in enumerate(records, 1):
+            lines.append(f"{i}. {record['duration'] * 1000:.1f} ms — {record.get('event_type')}/"
+                         f"{record.get('handler')} (update {record.get('update_id')}, "
+                         f"{record['at']:%Y-%m-%d %H:%M:%S})")
+            lines.append("   " + " · ".join(
+                f"{name} {record['phases'].get(name, 0.0) * 1000:.1f}" for name in PHASES))
+        return "\n".join(lines)
+
+
+class ProfilerSession:
+    """Профилирование event loop на ограниченное время через cProfile"""
+
+    MAX_SECONDS = 60
+
+    def __init__(self):
+        self._lock = asyncio.Lock()
+
+    @property
+    def running(self) -> bool:
+        return self._lock.locked()
+
+    async def run(self, seconds: float, sort="cumulative", limit=50) -> str:
+        """Запускать в потоке event loop: cProfile снимает профиль своего потока"""
+        if self.running:
+            raise RuntimeError("Профилирование уже запущено")
+        seconds = min(max(seconds, 1), self.MAX_SECONDS)
+        async with self._lock:
+            profiler = cProfile.Profile()
+            profiler.enable()
+            try:
+                await asyncio.sleep(seconds)
+            finally:
+                profiler.disable()
+        stream = io.StringIO()
+        stream.write(f"Профиль за {seconds:.0f} с\n\n")
+        pstats.Stats(profiler, stream=stream).sort_stats(sort).print_stats(limit)
+        return stream.getvalue()
@@ -0,0 +1,59 @@
+import logging
+from collections import namedtuple
+from datetime import date, timedelta
+
+logger = logging.getLogger(__name__)
+
+CalendarDay = namedtuple("CalendarDay", ["date", "week_type", "is_override", "is_holiday"])
+
+
+def default_week_type(day: date) -> str:
+    """Чётность недели по номеру ISO-недели"""
+    return "even" if day.isocalendar()[1] % 2 == 0 else "odd"
+
+
+class SchoolCalendar:
+    """Таблица дат учебного периода в памяти: чётность недели и выходные"""
+
+    def __init__(self, db, term_days=366):
+        self.db = db
+        self.term_days = term_days
+        self._days = {}  # {date: CalendarDay}
+        self.version = 0  # растёт при каждой правке, для кэшей ответов
+
+    def load(self, start: date = None):
+        """Досчитывает таблицу на период вперёд и загружает её в память"""
+        start = start or date.today()
+        end = start + timedelta(days=self.term_days)
+        days = [start + timedelta(days=i) for i in range(self.term_days + 1)]
+        self.db.fill_calendar([(day.isoformat(), default_week_type(day)) for day in days])
+        self._days = {
+            date.fromisoformat(row[0]): CalendarDay(date.fromisoformat(row[0]), row[1], bool(row[2]), bool(row[3]))
+            for row in self.db.get_calendar(start.isoformat(), end.isoformat())
+        }
+        logger.info("Календарь загружен: %s — %s", start, end)
+
+    def get(self, day: date) -> CalendarDay:
+        result = self._days.get(day)
+        if result is None:
+            # За пределами периода — обычная чётность без обращения к БД
+            result = CalendarDay(day, default_week_type(day), False, False)
+        return result
+
+    def week_type(self, day: date) -> str:
+        return self.get(day).week_type
+
+    def set_week_type(self, day: date, week_type: str):
+        """Переопределяет тип для всей учебной недели, в которую входит дата"""
+        monday = day - timedelta(days=day.weekday())
+        week = [monday + timedelta(days=i) for i in range(7)]
+        self.db.set_calendar_week_type([d.isoformat() for d in week], week_type)
+        for d in week:
+            self._days[d] = self.get(d)._replace(week_type=week_type, is_override=True)
+        self.version += 1
+
+    def set_holiday(self, day: date, is_holiday: bool):
+        current = self.get(day)
+        self.db.set_calendar_holiday(day.isoformat(), current.week_type, is_holiday)
+        self._days[day] = current._replace(is_holiday=is_holiday)
+        self.version += 1
@@ -0,0 +1,80 @@
+import asyncio
+import logging
+from dataclasses import dataclass
+from types import MappingProxyType
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class ScheduleSnapshot:
+    """Неизменяемый снимок метаданных расписаний одной версии БД"""
+    version: int
+    day_images: MappingProxyType  # {(group, day_of_week, week_type): image_path}
+    week_images: MappingProxyType  # {(group, week_type): image_path}
+    date_images: MappingProxyType  # {(group, date): image_path}
+    base_schedule: MappingProxyType  # {(group, day_of_week): (уроки...)}
+
+    @classmethod
+    def from_metadata(cls, data: dict):
+        base_schedule = {}
+        for group, day_of_week, *lesson in data["base_schedule"]:
+            base_schedule.setdefault((group, day_of_week), []).append(tuple(lesson))
+        return cls(
+            version=data["version"],
+            day_images=MappingProxyType({(g, d, w): p for g, d, w, p in data["schedule_images"]}),
+            week_images=MappingProxyType({(g, w): p for g, w, p in data["week_schedule"]}),
+            date_images=MappingProxyType({(g, d): p for g, d, p in data["actual_schedule_images"]}),
+            base_schedule=MappingProxyType({k: tuple(v) for k, v in base_schedule.items()}),
+        )
+
+    def day_image(self, group: str, day_of_week: int, week_type: str = "all"):
+        """Фото на день для типа недели, а если его нет — общее"""
+        return (self.day_images.get((group, day_of_week, week_type))
+                or self.day_images.get((group, day_of_week, "all")))
+
+    def week_image(self, group: str, week_type: str = "all"):
+        return self.week_images.get((group, week_type)) or self.week_images.get((group, "all"))
+
+    def date_image(self, group: str, date: str):
+        return self.date_images.get((group, date))
+
+    def lessons(self, group: str, day_of_week: int):
+        return self.base_schedule.get((group, day_of_week), ())
+
+    def image_paths(self) -> set:
+        return {*self.day_images.values(), *self.week_images.values(), *self.date_images.values()}
+
+
+class SnapshotCache:
+    """Держит актуальный снимок и подменяет его целиком при смене версии в БД"""
+
+    def __init__(self, db, file_index=None):
+        self.db = db
+        self.file_index = file_index
+        self.snapshot = None
+
+    def load(self):
+        """Блокирующий вызов: читает БД и атомарно подменяет снимок"""
+        snapshot = ScheduleSnapshot.from_metadata(self.db.load_schedule_metadata())
+        if self.file_index is not None:
+            # Фото мог загрузить или удалить другой процесс — сверяем индекс до подмены
+            self.file_index.sync(snapshot.image_paths())
+        self.snapshot = snapshot
+        logger.info("Загружен снимок расписаний версии %d", self.snapshot.version)
+
+    def refresh_if_stale(self) -> bool:
+        """Перечитывает снимок, если версию подняла запись этого или другого процесса"""
+        if self.snapshot is not None and self.db.get_data_version() == self.snapshot.version:
+            return False
+        self.load()
+        return True
+
+    async def watch(self, interval=5.0):
+        """Периодически проверяет версию в БД"""
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await asyncio.to_thread(self.refresh_if_stale)
+            except Exception as e:
+                logger.error("Не удалось обновить снимок расписаний: %s", e)
@@ -0,0 +1,68 @@
+import asyncio
+import logging
+import time
+
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware
+from aiogram.exceptions import TelegramNetworkError, TelegramRetryAfter, TelegramServerError
+from aiogram.methods import GetUpdates
+
+logger = logging.getLogger(__name__)
+
+
+class RetryMiddleware(BaseRequestMiddleware):
+    """Ограничивает число одновременных запросов к Telegram и повторяет неудачные"""
+
+    def __init__(self, max_concurrency=20, max_retries=3, base_delay=0.5, max_delay=30.0):
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._timing_hooks = []
+
+    def add_timing_hook(self, hook):
+        """hook(method_name, seconds, ok) вызывается после каждой попытки запроса"""
+        self._timing_hooks.append(hook)
+
+    async def __call__(self, make_request, bot, method):
+        if isinstance(method, GetUpdates):
+            # Long polling висит подолгу и сам повторяется в диспетчере
+            return await make_request(bot, method)
+        method_name = type(method).__name__
+        attempt = 0
+        while True:
+            started = time.perf_counter()
+            ok = False
+            try:
+                async with self._semaphore:
+                    response = await make_request(bot, method)
+                ok = True
+                return response
+            except (TelegramRetryAfter, TelegramNetworkError, TelegramServerError) as e:
+                if attempt >= self.max_retries:
+                    raise
+                if isinstance(e, TelegramRetryAfter):
+                    # Telegram сам говорит, сколько ждать; долгий flood-wait не пережидаем,
+                    # иначе ответ пользователю повиснет на минуты
+                    if e.retry_after > self.max_delay:
+                        raise
+                    delay = e.retry_after
+                else:
+                    delay = min(self.base_delay * 2 ** attempt, self.max_delay)
+                logger.warning("%s: %s; повтор через %.1f с (попытка %d)", method_name, e, delay, attempt + 1,
+                               extra={"event": "telegram_retry"})
+            finally:
+                elapsed = time.perf_counter() - started
+                for hook in self._timing_hooks:
+                    hook(method_name, elapsed, ok)
+            attempt += 1
+            # Ждём вне семафора, чтобы не занимать место других запросов
+            await asyncio.sleep(delay)
+
+
+def create_session(max_connections=100, max_concurrency=20, max_retries=3, timeout=60.0):
+    """Сессия с общим пулом keep-alive соединений и политикой повторов"""
+    session = AiohttpSession(limit=max_connections, timeout=timeout)
+    retry = RetryMiddleware(max_concurrency=max_concurrency, max_retries=max_retries)
+    session.middleware(retry)
+    return session, retry
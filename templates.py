@@ -0,0 +1,127 @@
+from functools import lru_cache
+from typing import Tuple
+
+from aiogram.types import ReplyKeyboardMarkup, KeyboardButton, InlineKeyboardMarkup, InlineKeyboardButton
+from pydantic import ConfigDict, field_serializer
+
+# Одна клавиатура отдаётся во все ответы, поэтому она должна быть неизменяемой.
+# Клавиатуры aiogram изменяемые — замораживаем подклассами, ряды храним в кортежах.
+
+
+class FrozenInlineKeyboardButton(InlineKeyboardButton):
+    model_config = ConfigDict(frozen=True)
+
+
+class FrozenKeyboardButton(KeyboardButton):
+    model_config = ConfigDict(frozen=True)
+
+
+class FrozenInlineKeyboardMarkup(InlineKeyboardMarkup):
+    model_config = ConfigDict(frozen=True)
+    inline_keyboard: Tuple[Tuple[FrozenInlineKeyboardButton, ...], ...]
+
+    @field_serializer("inline_keyboard")
+    def _serialize_rows(self, rows) -> list[list[InlineKeyboardButton]]:
+        # Сессия aiogram разбирает только списки
+        return [list(row) for row in rows]
+
+
+class FrozenReplyKeyboardMarkup(ReplyKeyboardMarkup):
+    model_config = ConfigDict(frozen=True)
+    keyboard: Tuple[Tuple[FrozenKeyboardButton, ...], ...]
+
+    @field_serializer("keyboard")
+    def _serialize_rows(self, rows) -> list[list[KeyboardButton]]:
+        return [list(row) for row in rows]
+
+
+SHORT_DAYS = ("Пн", "Вт", "Ср", "Чт", "Пт", "Сб")
+DAY_NAMES = ("Понедельник", "Вторник", "Среда", "Четверг", "Пятница", "Суббота")
+
+
+def _button(text: str, callback_data: str) -> FrozenInlineKeyboardButton:
+    return FrozenInlineKeyboardButton(text=text, callback_data=callback_data)
+
+
+BACK_BUTTON = _button("↩️ Назад", "back_to_admin_schedule")
+
+USER_MENU = FrozenReplyKeyboardMarkup(
+    resize_keyboard=True,
+    one_time_keyboard=False,
+    keyboard=[
+        [FrozenKeyboardButton(text='📅 Расписание'), FrozenKeyboardButton(text='📚 ДЗ')],
+    ],
+)
+
+ADMIN_MENU = FrozenReplyKeyboardMarkup(
+    resize_keyboard=True,
+    keyboard=[
+        [FrozenKeyboardButton(text='📅 Расписание'), FrozenKeyboardButton(text='⚙️ Редакция Расписания')],
+        [FrozenKeyboardButton(text='👥 Пользователи'), FrozenKeyboardButton(text='📚 ДЗ')],
+    ],
+)
+
+ADMIN_SCHEDULE_TEXT = "⚙️ <b>Админ-панель: Расписание</b>\n\nВыберите действие:"
+ADMIN_SCHEDULE_KEYBOARD = FrozenInlineKeyboardMarkup(inline_keyboard=[
+    [_button(f"{day} 📅", f"admin_schedule_day_{i}") for i, day in enumerate(SHORT_DAYS[:4])],
+    [_button(f"{day} 📅", f"admin_schedule_day_{i}") for i, day in enumerate(SHORT_DAYS[4:] + ("Вс",), 4)],
+    [
+        _button("📅 Сегодня", "admin_schedule_today"),
+        _button("📅 Завтра", "admin_schedule_tomorrow"),
+        _button("📅 На неделю", "admin_schedule_week"),
+    ],
+])
+
+UPLOAD_WEEK_TEXT = "📤 <b>Загрузка недельного расписания</b>\n\nВыберите тип недели:"
+UPLOAD_WEEK_KEYBOARD = FrozenInlineKeyboardMarkup(inline_keyboard=[
+    [_button("📤 Все недели", "upload_week_all")],
+    [_button("📤 Чётные недели", "upload_week_even")],
+    [_button("📤 Нечётные недели", "upload_week_odd")],
+    [BACK_BUTTON],
+])
+
+WEEK_STATUS_KEYBOARD = FrozenInlineKeyboardMarkup(inline_keyboard=[
+    [_button(day, f"admin_schedule_day_{i}") for i, day in enumerate(SHORT_DAYS)],
+    [_button("📤 Загрузить всю неделю", "upload_whole_week")],
+    [BACK_BUTTON],
+])
+
+QUICK_COMMANDS_TEXT = (
+    '┏━━━━━━━━━━━━━━━━━━━━━━━━━━━┓\n\n'
+    '  ➀: [ /Schedule ] ― Нажми, чтобы увидеть расписание.\n'
+    '  ➁: [ /HomeWork ] ― Нажми, чтобы узнать Д/З.\n'
+    '┗━━━━━━━━━━━━━━━━━━━━━━━━━━━┛'
+)
+USER_START_TEXT = 'Доброго времени суток, {full_name}! Вот список быстрых команд:\n\n' + QUICK_COMMANDS_TEXT
+ADMIN_START_TEXT = (
+    "👑 <b>Админ-панель</b>\n\n<b>Доступные команды:</b>\n"
+    '┏━━━━━━━━━━━━━━━━━━━━━━━━━━━┓\n\n'
+    "• /admin_schedule - управление расписанием\n"
+    "• /users - список пользователей\n"
+    "• /broadcast - рассылка\n\n"
+    '┗━━━━━━━━━━━━━━━━━━━━━━━━━━━┛\n'
+    "Или используйте кнопки ниже.\n\n" + USER_START_TEXT
+)
+
+
+@lru_cache(maxsize=None)
+def day_admin_keyboard(day_num: int, has_all: bool) -> FrozenInlineKeyboardMarkup:
+    """Клавиатура управления днём: всего 12 вариантов, каждый строится один раз"""
+    upload = _button("📤 Загрузить (все)", f"upload_day_{day_num}_all")
+    if has_all:
+        rows = [[_button("👁️ Показать (все)", f"show_day_{day_num}_all"), upload], [BACK_BUTTON]]
+    else:
+        rows = [[upload, BACK_BUTTON]]
+    return FrozenInlineKeyboardMarkup(inline_keyboard=rows)
+
+
+def day_admin_text(day_num: int, has_all: bool) -> str:
+    return f"📅 <b>{DAY_NAMES[day_num]}</b>\n\n📁 Все недели: {'✅' if has_all else '❌'}\n"
+
+
+@lru_cache(maxsize=64)
+def week_status_text(statuses: tuple) -> str:
+    """statuses — есть ли фото на каждый день с понедельника по субботу"""
+    lines = "".join(f"{day}: {'✅' if ok else '❌'}\n" for day, ok in zip(SHORT_DAYS, statuses))
+    return f"🗓️ <b>Статус расписания на неделю:</b>\n\n{lines}\nНажмите на день для управления"
+